@@ -5,10 +5,44 @@ from fastapi import FastAPI
 from fastapi_pagination import add_pagination
 from fastapi_versioning import VersionedFastAPI
 
-from core.config import SWAP_TOKEN_ENDPOINT
-from core.database import db
+from core.config import (
+    API_RESPONSE_CLASS,
+    AUTH_STATELESS,
+    DB_POOL_ADAPTIVE,
+    DB_POOL_GROW_WAIT,
+    DB_POOL_MAX_SIZE,
+    DB_POOL_MIN_SIZE,
+    DB_POOL_RESIZE_INTERVAL,
+    DB_QUERY_TIMING,
+    DB_SLOW_QUERY_THRESHOLD,
+    GOOGLE_CLIENT_SECRETS_JSON,
+    JWKS_ENDPOINT,
+    JWKS_MAX_AGE,
+    METRICS_ENABLED,
+    METRICS_ENDPOINT,
+    METRICS_POOL_SAMPLE_INTERVAL,
+    SWAP_TOKEN_ENDPOINT,
+)
+from core.database import db, replicas
+from core.database.models.security.auth import hash_executor
+from core.schemas.security.oauth2 import access_token_keys
+from core.services.security import (
+    google_client_config,
+    google_oauth2_client,
+    revoked_users,
+)
+from core.utils import (
+    RESPONSE_CLASSES,
+    AdaptivePoolSize,
+    MetricsMiddleware,
+    PoolMetrics,
+    QueryTiming,
+    ServerTimingMiddleware,
+    jwks_endpoint,
+    metrics_endpoint,
+)
 
-from .v1 import security_router  # noqa: I201
+from .v1 import security_router, users_router  # noqa: I201
 
 
 def get_app() -> FastAPI:
@@ -16,6 +50,7 @@ def get_app() -> FastAPI:
     return FastAPI(
         title="{{ cookiecutter.project_short_description }}",
         version="0.1.0",
+        default_response_class=RESPONSE_CLASSES[API_RESPONSE_CLASS],
         swagger_ui_oauth2_redirect_url=SWAP_TOKEN_ENDPOINT,
         swagger_ui_init_oauth={
             "clientId": "please keep this value",
@@ -28,6 +63,7 @@ def get_app() -> FastAPI:
 def configure_routes(application: FastAPI):
     """Configure application."""
     application.include_router(security_router)
+    application.include_router(users_router)
     add_pagination(application)
 
 
@@ -36,6 +72,7 @@ def get_versioned_app(application: FastAPI) -> VersionedFastAPI:
         application,
         version_format="{major}",
         prefix_format="/api/v{major}",
+        default_response_class=RESPONSE_CLASSES[API_RESPONSE_CLASS],
         swagger_ui_oauth2_redirect_url=SWAP_TOKEN_ENDPOINT,
     )
 
@@ -44,10 +81,110 @@ def configure_db(application: FastAPI):
     db.init_app(application)
 
 
-app = get_app()
-configure_routes(application=app)
-app = get_versioned_app(application=app)
-configure_db(app)
+def configure_pool_sizing(application: FastAPI):
+    """Move the db pool floor by observed acquire wait.
+
+    Should be configured after the db, because pool is created on startup.
+    """
+    if not DB_POOL_ADAPTIVE:
+        return
+    pool_size = AdaptivePoolSize(
+        db,
+        min_size=DB_POOL_MIN_SIZE,
+        max_size=DB_POOL_MAX_SIZE,
+        interval=DB_POOL_RESIZE_INTERVAL,
+        grow_wait=DB_POOL_GROW_WAIT,
+    )
+    application.add_event_handler("startup", pool_size.start)
+    application.add_event_handler("shutdown", pool_size.stop)
+
+
+def configure_replicas(application: FastAPI):
+    """Open read replicas pools, if there are any, after the primary one."""
+    application.add_event_handler("startup", replicas.start)
+    application.add_event_handler("shutdown", replicas.stop)
+
+
+def configure_executors(application: FastAPI):
+    """Release CPU-bound executors on shutdown."""
+    application.add_event_handler("shutdown", hash_executor.shutdown)
+
+
+def configure_oauth2(application: FastAPI):
+    """Parse Google client secrets once on startup."""
+    if GOOGLE_CLIENT_SECRETS_JSON:
+        application.add_event_handler("startup", google_client_config.load)
+    application.add_event_handler("shutdown", google_oauth2_client.close)
+
+
+def configure_jwks(application: FastAPI):
+    """Publish access tokens public keys, other services verify tokens offline."""
+    keys = access_token_keys()
+    if keys is None:
+        return
+    application.add_route(
+        JWKS_ENDPOINT,
+        jwks_endpoint(keys.jwks(), max_age=JWKS_MAX_AGE),
+        include_in_schema=False,
+    )
+
+
+def configure_revoked_users(application: FastAPI):
+    """Keep stateless access tokens revocation filter up to date."""
+    if AUTH_STATELESS:
+        application.add_event_handler("startup", revoked_users.start)
+        application.add_event_handler("shutdown", revoked_users.stop)
+
+
+def configure_metrics(application: FastAPI):
+    """Expose request latency and db pool metrics in Prometheus format.
+
+    Should be configured after the db, because pool is created on startup.
+    """
+    if not METRICS_ENABLED:
+        return
+    pool_metrics = PoolMetrics(db, interval=METRICS_POOL_SAMPLE_INTERVAL)
+    application.add_event_handler("startup", pool_metrics.start)
+    application.add_event_handler("shutdown", pool_metrics.stop)
+    application.add_middleware(MetricsMiddleware, routes=application.routes)
+    application.add_route(
+        METRICS_ENDPOINT, metrics_endpoint(pool_metrics), include_in_schema=False
+    )
+
+
+def configure_query_timing(application: FastAPI):
+    """Report per-request queries in a Server-Timing header, log slow ones.
+
+    Should be configured after the db and replicas, because engines are created
+    on startup.
+    """
+    if not DB_QUERY_TIMING:
+        return
+    query_timing = QueryTiming(
+        db, slow_threshold=DB_SLOW_QUERY_THRESHOLD, replicas=replicas
+    )
+    application.add_event_handler("startup", query_timing.instrument)
+    application.add_middleware(ServerTimingMiddleware)
+
+
+def create_app() -> VersionedFastAPI:
+    """Fully configured versioned application."""
+    application = get_app()
+    configure_routes(application=application)
+    application = get_versioned_app(application=application)
+    configure_db(application)
+    configure_pool_sizing(application)
+    configure_replicas(application)
+    configure_executors(application)
+    configure_oauth2(application)
+    configure_jwks(application)
+    configure_revoked_users(application)
+    configure_metrics(application)
+    configure_query_timing(application)
+    return application
+
+
+app = create_app()
 
 
 __all__ = ["app", "db"]
@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
 """Project API (version 1)."""
 
-from .handlers import security_router
+from .handlers import security_router, users_router
 
-__all__ = ("security_router",)
+__all__ = ("security_router", "users_router")
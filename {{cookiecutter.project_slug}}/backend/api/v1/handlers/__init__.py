@@ -2,5 +2,6 @@
 """{{ cookiecutter.project_slug }} rest-api handlers."""
 
 from .security import security_router
+from .users import users_router
 
-__all__ = ("security_router",)
+__all__ = ("security_router", "users_router")
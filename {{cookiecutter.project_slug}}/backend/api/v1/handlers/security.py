@@ -2,61 +2,55 @@
 """Security rest-api handlers."""
 
 from fastapi import APIRouter, Depends, Form, status
-from fastapi.responses import RedirectResponse
+from fastapi.responses import ORJSONResponse, RedirectResponse
 from fastapi_versioning import version
-from google.auth.transport import requests
-from google.oauth2 import id_token
-from google_auth_oauthlib.flow import Flow as GFlow
-from oauthlib.oauth2 import OAuth2Error
 
-from core.config import (
-    API_LOCATION,
-    GOOGLE_CLIENT_SECRETS_JSON,
-    GOOGLE_SCOPES,
-    SWAP_TOKEN_ENDPOINT,
-)
 from core.database import UserGinoModel
-from core.schemas import GoogleIdInfo, Token, UserDBDataModel
+from core.schemas import Token, UserDBDataModel
 from core.services.security import (
     get_current_user,
     get_or_create_user,
     get_user_for_refresh,
+    google_client_config,
+    google_oauth2_client,
+    limit_by_ip,
+    limit_refresh_by_user,
+    revoked_users,
 )
-from core.utils import CREDENTIALS_EX, OAUTH2_EX
+from core.utils import ETagRoute
 
-security_router = APIRouter(redirect_slashes=True, tags=["security"])
+# GET responses have ETags, user info is polled by frontends
+security_router = APIRouter(
+    redirect_slashes=True, tags=["security"], route_class=ETagRoute
+)
 
 
-@security_router.post("/swap_token", response_model=Token, tags=["security"])
+# OAuth2 token responses are plain JSON (RFC 6749 5.1), not JSON:API documents
+@security_router.post(
+    "/swap_token",
+    response_model=Token,
+    response_class=ORJSONResponse,
+    tags=["security"],
+    dependencies=[Depends(limit_by_ip)],
+)
 @version(1)
-async def swap_token(code: str = Form(...)):  # pragma: no cover  # noqa: B008
+async def swap_token(code: str = Form(...)):  # noqa: B008
     """Check Google Auth code and create access token."""
-    # Get authentication code
-    flow = GFlow.from_client_secrets_file(
-        GOOGLE_CLIENT_SECRETS_JSON, scopes=GOOGLE_SCOPES
-    )
-    flow.redirect_uri = f"{API_LOCATION}{SWAP_TOKEN_ENDPOINT}"
-    try:
-        flow.fetch_token(code=code)
-    except OAuth2Error:
-        raise OAUTH2_EX
-    else:
-        credentials = flow.credentials
-    # token validation
-    try:
-        id_info = id_token.verify_oauth2_token(
-            credentials.id_token, requests.Request(), credentials.client_id
-        )
-        id_info = GoogleIdInfo(**id_info)
-    except ValueError:
-        raise CREDENTIALS_EX
+    id_info = await google_oauth2_client.authenticate(code)
     # get user object
     authenticated_user = await get_or_create_user(id_info)
     # generate system token for a user
     return await authenticated_user.create_token()
 
 
-@security_router.post("/refresh_access_token", response_model=Token, tags=["security"])
+@security_router.post(
+    "/refresh_access_token",
+    response_model=Token,
+    response_class=ORJSONResponse,
+    tags=["security"],
+    # checked before the refresh token hash is verified
+    dependencies=[Depends(limit_by_ip), Depends(limit_refresh_by_user)],
+)
 @version(1)
 async def refresh_access_token(
     current_user: UserGinoModel = Depends(get_user_for_refresh),  # noqa: B008
@@ -67,10 +61,7 @@ async def refresh_access_token(
 @security_router.get("/login", tags=["auth"])
 @version(1)
 async def login(state: str):
-    flow = GFlow.from_client_secrets_file(
-        GOOGLE_CLIENT_SECRETS_JSON, scopes=GOOGLE_SCOPES
-    )
-    flow.redirect_uri = f"{API_LOCATION}{SWAP_TOKEN_ENDPOINT}"
+    flow = google_client_config.flow()
     authorization_url, frontend_state = flow.authorization_url(
         access_type="offline", state=state, include_granted_scopes="true"
     )
@@ -82,6 +73,7 @@ async def login(state: str):
 @version(1)
 async def logout(current_user: UserGinoModel = Depends(get_current_user)):  # noqa: B008
     await current_user.delete_refresh_token()
+    revoked_users.add(current_user.id)
 
 
 @security_router.get("/user/info", response_model=UserDBDataModel)
@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+"""Users rest-api handlers."""
+
+from fastapi import APIRouter, Depends
+from fastapi_versioning import version
+
+from core.config import USERS_BATCH_MAX_SIZE
+from core.database import UserGinoModel
+from core.schemas import UserDBListModel
+from core.services.security import get_current_user
+from core.utils import ETagRoute, id_filter
+
+users_router = APIRouter(redirect_slashes=True, tags=["users"], route_class=ETagRoute)
+
+
+@users_router.get(
+    "/users", response_model=UserDBListModel, dependencies=[Depends(get_current_user)]
+)
+@version(1)
+async def users_batch(
+    user_ids: list = Depends(id_filter(USERS_BATCH_MAX_SIZE)),  # noqa: B008
+):
+    """Users by `filter[id]` in the requested order with a single query.
+
+    Ids without a user are listed in `meta.missing`.
+    """
+    users = await UserGinoModel.get_batch(user_ids)
+    return {
+        "data": [users[ident].data for ident in user_ids if ident in users],
+        "meta": {"missing": [ident for ident in user_ids if ident not in users]},
+    }
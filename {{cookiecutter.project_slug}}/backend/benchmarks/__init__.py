@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""Project performance benchmarks.
+
+Run from the backend directory, e.g. `python -m benchmarks.gino_models`.
+"""
+
+import json
+import sys
+from pathlib import Path
+from time import perf_counter
+from timeit import Timer
+
+BASELINES_DIR = Path(__file__).parent / "baselines"
+
+
+def measure(func, number: int = 1000, repeat: int = 5) -> float:
+    """Best of `repeat` runs, seconds per call."""
+    return min(Timer(func).repeat(repeat=repeat, number=number)) / number
+
+
+async def ameasure(func, number: int = 1000, repeat: int = 5) -> float:
+    """Best of `repeat` runs, seconds per awaited func() call."""
+    timings = []
+    for _ in range(repeat):
+        started = perf_counter()
+        for _ in range(number):
+            await func()
+        timings.append(perf_counter() - started)
+    return min(timings) / number
+
+
+def report(name: str, baseline: float, candidate: float):
+    """Print baseline and candidate timings with a speedup."""
+    sys.stdout.write(
+        f"{name}: {baseline * 1e6:.1f}us -> {candidate * 1e6:.1f}us "
+        f"(x{baseline / candidate:.1f})\n"
+    )
+
+
+def read_baselines(path: Path) -> dict:
+    """Stored baselines, empty if there are none yet."""
+    return json.loads(path.read_text()) if path.exists() else {}
+
+
+def write_baselines(path: Path, results: dict):
+    """Merge grouped results into stored baselines."""
+    baselines = read_baselines(path)
+    for group, group_results in results.items():
+        baselines.setdefault(group, {}).update(group_results)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(baselines, indent=2, sort_keys=True) + "\n")
+
+
+def report_regressions(failed: list) -> int:
+    """Print regressions, exit code for a benchmark."""
+    for message in failed:
+        sys.stdout.write(f"REGRESSION {message}\n")
+    return 1 if failed else 0
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""Users bulk import benchmark.
+
+Compares a row by row `User.insert_or_update_by_ext_id` with COPY and a single
+set-based upsert of `User.import_profiles`, for new users and for an import
+of the same profiles again. Needs a migrated database configured by the usual
+DB_* environment variables, created users are removed afterwards.
+"""
+
+import asyncio
+from time import perf_counter
+
+from core.config import DB_DSN
+from core.database import UserGinoModel, db
+
+from . import report
+
+USERS = 10000
+
+
+def profiles(prefix: str) -> list:
+    return [
+        {
+            "ext_id": f"{prefix}-{i}",
+            "username": f"user-{i}",
+            "given_name": f"Given {i}",
+            "family_name": f"Family {i}",
+            "full_name": f"Given Family {i}",
+        }
+        for i in range(USERS)
+    ]
+
+
+async def row_by_row(users: list):
+    for user in users:
+        await UserGinoModel.insert_or_update_by_ext_id(sub=user["ext_id"], **user)
+
+
+async def timed(func, users: list) -> float:
+    started = perf_counter()
+    await func(users)
+    return perf_counter() - started
+
+
+async def main():
+    await db.set_bind(DB_DSN, min_size=1, max_size=1)
+    rows, bulk = profiles("benchmark-rows"), profiles("benchmark-bulk")
+    try:
+        timings = {
+            "new": (
+                await timed(row_by_row, rows),
+                await timed(UserGinoModel.import_profiles, bulk),
+            ),
+            "unchanged": (
+                await timed(row_by_row, rows),
+                await timed(UserGinoModel.import_profiles, bulk),
+            ),
+        }
+    finally:
+        await UserGinoModel.delete.where(
+            UserGinoModel.ext_id.like("benchmark-%")
+        ).gino.status()
+        await db.pop_bind().close()
+    for name, (baseline, candidate) in timings.items():
+        report(
+            f"import of {USERS} {name} users, per user",
+            baseline / USERS,
+            candidate / USERS,
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""Hot statements compilation benchmark.
+
+Compares statements built and compiled by SQLAlchemy on every execution
+with compiled once ones, with and without asyncpg named prepared
+statements (`DB_PREPARED_STATEMENTS=false` for pgbouncer). Needs a migrated
+database configured by the usual DB_* environment variables, created
+users are removed afterwards.
+"""
+
+import asyncio
+from uuid import uuid4
+
+from core.config import DB_DSN
+from core.database import TokenInfoGinoModel, UserGinoModel, db
+from core.database.models.security.auth import hmac_hash
+
+from . import ameasure, report
+
+
+def statements(user) -> dict:
+    """Compiled on every execution and compiled once statements by name."""
+    profile = {
+        "id": uuid4(),
+        "sub": user.ext_id,
+        "username": user.username,
+        "family_name": None,
+        "given_name": None,
+        "full_name": None,
+    }
+    token = {"user_id": user.id, "token_hash": hmac_hash("benchmark")}
+    return {
+        "User.get": (
+            lambda: UserGinoModel.query.where(UserGinoModel.id == user.id).gino.first(),
+            lambda: UserGinoModel.get(user.id),
+        ),
+        "TokenInfo.get": (
+            lambda: TokenInfoGinoModel.query.where(
+                TokenInfoGinoModel.user_id == user.id
+            ).gino.first(),
+            lambda: TokenInfoGinoModel.get(user.id),
+        ),
+        "User upsert by ext_id": (
+            lambda: db.first(UserGinoModel.upsert_by_ext_id_query(), **profile),
+            lambda: UserGinoModel._upsert_by_ext_id.first(**profile),
+        ),
+        "TokenInfo hash upsert": (
+            lambda: db.status(TokenInfoGinoModel.set_token_hash_query(), **token),
+            lambda: TokenInfoGinoModel._set_token_hash.status(**token),
+        ),
+    }
+
+
+async def run(user, **bind_options) -> dict:
+    await db.set_bind(DB_DSN, min_size=1, max_size=1, **bind_options)
+    try:
+        return {
+            name: (await ameasure(every_time), await ameasure(once))
+            for name, (every_time, once) in statements(user).items()
+        }
+    finally:
+        await db.pop_bind().close()
+
+
+async def main():
+    await db.set_bind(DB_DSN)
+    user = await UserGinoModel.create(ext_id="benchmark", username="benchmark")
+    await db.pop_bind().close()
+    try:
+        named = await run(user)
+        unnamed = await run(user, statement_cache_size=0)
+    finally:
+        await db.set_bind(DB_DSN)
+        await UserGinoModel.delete.where(UserGinoModel.id == user.id).gino.status()
+        await db.pop_bind().close()
+    for name, (every_time, once) in named.items():
+        report(f"{name}, compiled once", every_time, once)
+    for name, (every_time, once) in unnamed.items():
+        report(f"{name}, compiled once, unnamed statements", every_time, once)
+    for name in named:
+        report(f"{name}, named statements", unnamed[name][1], named[name][1])
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
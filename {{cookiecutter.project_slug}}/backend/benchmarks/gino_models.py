@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""JsonApiGinoModel serialization benchmark.
+
+Compares `dir()` based attributes lookup with a per-class precomputed
+getter on a list endpoint sized page of users.
+"""
+
+from datetime import datetime, timezone
+from inspect import iscoroutinefunction
+from uuid import uuid4
+
+from core.database import UserGinoModel
+from core.schemas import UserDBModel
+
+from . import measure, report
+
+PAGE_SIZE = 50
+
+_attrs_to_skip = frozenset(("attributes", "id", "data", "type"))
+_crud_base_methods = frozenset(("update", "query", "create", "select", "delete"))
+
+
+def dir_attributes(obj):
+    """Previous JsonApiGinoModel.attributes implementation."""
+    result_dict = dict()
+    for attr in dir(obj):
+        if attr.startswith("_") or attr in _crud_base_methods:
+            continue
+        if attr.endswith("_query") or attr in _attrs_to_skip:
+            continue
+        if hasattr(obj.__class__, attr) and callable(getattr(obj.__class__, attr)):
+            continue
+        attr_value = getattr(obj, attr)
+        if iscoroutinefunction(attr_value):
+            continue
+        result_dict[attr] = attr_value
+    return result_dict
+
+
+def dir_data(obj):
+    return {"id": obj.id, "type": obj.type, "attributes": dir_attributes(obj)}
+
+
+def users_page(size: int = PAGE_SIZE):
+    return [
+        UserGinoModel(
+            id=uuid4(),
+            ext_id=str(i),
+            disabled=False,
+            superuser=False,
+            created=datetime.now(timezone.utc),
+            username=f"user-{i}",
+            given_name="given",
+            family_name="family",
+            full_name="full",
+        )
+        for i in range(size)
+    ]
+
+
+def main():
+    users = users_page()
+    report(
+        f"data x{PAGE_SIZE}",
+        measure(lambda: [dir_data(user) for user in users], number=20),
+        measure(lambda: [user.data for user in users], number=20),
+    )
+    report(
+        f"UserDBModel(**data) x{PAGE_SIZE}",
+        measure(lambda: [UserDBModel(**dir_data(user)) for user in users], number=20),
+        measure(lambda: [UserDBModel(**user.data) for user in users], number=20),
+    )
+
+
+if __name__ == "__main__":
+    main()
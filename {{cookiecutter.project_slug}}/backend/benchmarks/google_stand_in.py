@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+"""Local stand-in for Google OAuth2 token and certs endpoints.
+
+Every authorization code `code-<n>` is exchanged for an ID token of a
+`load-<n>` user, issued for the configured GOOGLE_CLIENT_ID. Tokens are
+signed before the server start, so the stand-in costs as little as
+possible during a load test.
+"""
+
+import json
+import socket
+import threading
+import time
+from datetime import datetime
+
+import uvicorn
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from google.auth import crypt
+from google.auth import jwt as google_jwt
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from core.config import GOOGLE_CLIENT_ID
+
+KEY_ID = "stand-in"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def signing_key() -> tuple:
+    """Private and public PEM of a new RSA key."""
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    private_pem = private_key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    )
+    public_pem = private_key.public_key().public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+    )
+    return private_pem.decode(), public_pem.decode()
+
+
+def id_tokens(private_pem: str, users: int) -> dict:
+    """Signed ID token by authorization code."""
+    signer = crypt.RSASigner.from_string(private_pem, key_id=KEY_ID)
+    now = int(datetime.utcnow().timestamp())
+    return {
+        f"code-{i}": google_jwt.encode(
+            signer,
+            {
+                "aud": GOOGLE_CLIENT_ID,
+                "iss": "https://accounts.google.com",
+                "sub": f"load-{i}",
+                "iat": now,
+                "exp": now + 3600,
+                "email": f"load-{i}@example.com",
+                "given_name": f"load-{i}",
+                "family_name": "load",
+                "name": f"load-{i} load",
+            },
+        ).decode()
+        for i in range(users)
+    }
+
+
+class GoogleStandIn:
+    """Stand-in server running in a background thread."""
+
+    def __init__(self, users: int):
+        private_pem, public_pem = signing_key()
+        self.tokens = id_tokens(private_pem, users)
+        self.certs = {KEY_ID: public_pem}
+        self.port = free_port()
+        self.__server = None
+        self.__thread = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def client_secrets(self, path: str):
+        """Write client secrets file pointing to the stand-in."""
+        with open(path, "w") as secrets_file:
+            json.dump(
+                {
+                    "web": {
+                        "client_id": GOOGLE_CLIENT_ID,
+                        "client_secret": "secret",
+                        "auth_uri": f"{self.url}/auth",
+                        "token_uri": f"{self.url}/token",
+                    }
+                },
+                secrets_file,
+            )
+
+    async def token(self, request: Request) -> JSONResponse:
+        form = await request.form()
+        id_token = self.tokens.get(form.get("code"))
+        if id_token is None:
+            return JSONResponse({"error": "invalid_grant"}, status_code=400)
+        return JSONResponse({"id_token": id_token, "access_token": "stand-in"})
+
+    async def certs_endpoint(self, request: Request) -> JSONResponse:
+        return JSONResponse(
+            self.certs, headers={"Cache-Control": "public, max-age=3600"}
+        )
+
+    def app(self) -> Starlette:
+        return Starlette(
+            routes=[
+                Route("/token", self.token, methods=["POST"]),
+                Route("/certs", self.certs_endpoint),
+            ]
+        )
+
+    def start(self):
+        config = uvicorn.Config(
+            self.app(), host="127.0.0.1", port=self.port, log_level="warning"
+        )
+        self.__server = uvicorn.Server(config)
+        self.__thread = threading.Thread(target=self.__server.run, daemon=True)
+        self.__thread.start()
+        while not self.__server.started:
+            time.sleep(0.01)
+
+    def stop(self):
+        self.__server.should_exit = True
+        self.__thread.join()
@@ -0,0 +1,333 @@
+# -*- coding: utf-8 -*-
+"""Auth endpoints load test.
+
+Drives `api:app` in-process through an ASGI transport and over a real
+uvicorn socket, against the database configured by the DB_* environment
+variables, with a local Google stand-in for `/swap_token`.
+
+Results are compared with stored baselines, the exit code is 1 if
+throughput or p99 latency regressed past the tolerance:
+
+    python -m benchmarks.load --update-baselines
+    python -m benchmarks.load
+    python -m benchmarks.load --transport asgi --scenarios user_info
+
+Baselines are machine specific and are not committed, record them on the
+machine that runs the comparison. Without baselines results are only reported.
+"""
+
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+from contextlib import asynccontextmanager
+from pathlib import Path
+from statistics import quantiles
+from time import monotonic, perf_counter
+
+import httpx
+
+from core.config import DB_DSN
+from core.database import UserGinoModel, db
+from core.services.security import (
+    google_client_config,
+    google_oauth2_client,
+    ip_rate_limit,
+    user_rate_limit,
+)
+
+from . import BASELINES_DIR, read_baselines, report_regressions, write_baselines
+from .google_stand_in import GoogleStandIn, free_port
+
+API = "/api/v1"
+SCENARIOS = ("user_info", "refresh_access_token", "swap_token", "logout")
+TRANSPORTS = ("asgi", "socket")
+# bcrypt refresh token hashing may queue requests for seconds
+TIMEOUT = 60
+BASELINES = BASELINES_DIR / "load.json"
+
+
+class Result:
+    """Load test result of a single scenario."""
+
+    def __init__(self, latencies: list, errors: int, seconds: float, concurrency: int):
+        self.latencies = latencies
+        self.concurrency = concurrency
+        self.errors = errors
+        self.seconds = seconds
+
+    def summary(self) -> dict:
+        percentiles = quantiles(self.latencies, n=100, method="inclusive")
+        return {
+            "requests": len(self.latencies),
+            "concurrency": self.concurrency,
+            "errors": self.errors,
+            "rps": round(len(self.latencies) / self.seconds, 1),
+            "p50_ms": round(percentiles[49] * 1000, 2),
+            "p90_ms": round(percentiles[89] * 1000, 2),
+            "p99_ms": round(percentiles[98] * 1000, 2),
+        }
+
+
+async def generate_load(request, requests: int, concurrency: int) -> Result:
+    """Send `requests` requests by `concurrency` workers.
+
+    `request(worker, number)` should return True for a successful response.
+    """
+    latencies = []
+    errors = 0
+    counter = iter(range(requests))
+
+    async def worker(index: int):
+        nonlocal errors
+        for number in counter:
+            started = perf_counter()
+            try:
+                succeeded = await request(index, number)
+            except httpx.HTTPError:
+                succeeded = False
+            latencies.append(perf_counter() - started)
+            errors += not succeeded
+
+    started = perf_counter()
+    await asyncio.gather(*(worker(index) for index in range(concurrency)))
+    return Result(latencies, errors, perf_counter() - started, concurrency)
+
+
+async def create_users(count: int) -> list:
+    """Users of the stand-in ID tokens with a generated tokens."""
+    tokens = []
+    for i in range(count):
+        user = await UserGinoModel.insert_or_update_by_ext_id(
+            sub=f"load-{i}", username=f"load-{i}"
+        )
+        tokens.append(await user.create_token())
+    return tokens
+
+
+async def delete_users():
+    await UserGinoModel.delete.where(UserGinoModel.ext_id.like("load-%")).gino.status()
+
+
+def scenarios(client: httpx.AsyncClient, tokens: list) -> dict:
+    """Request functions by scenario name, every worker acts as one user."""
+    refresh_tokens = [token["refresh_token"] for token in tokens]
+    headers = [{"Authorization": f"Bearer {token['access_token']}"} for token in tokens]
+
+    async def user_info(worker: int, number: int) -> bool:
+        response = await client.get(f"{API}/user/info", headers=headers[worker])
+        return response.status_code == 200
+
+    async def refresh_access_token(worker: int, number: int) -> bool:
+        response = await client.post(
+            f"{API}/refresh_access_token", params={"token": refresh_tokens[worker]}
+        )
+        if response.status_code != 200:
+            return False
+        # refresh token is rotated on every refresh
+        refresh_tokens[worker] = response.json()["refresh_token"]
+        return True
+
+    async def swap_token(worker: int, number: int) -> bool:
+        response = await client.post(
+            f"{API}/swap_token", data={"code": f"code-{worker}"}
+        )
+        return response.status_code == 200
+
+    async def logout(worker: int, number: int) -> bool:
+        response = await client.get(f"{API}/logout", headers=headers[worker])
+        return response.status_code == 204
+
+    return {
+        "user_info": user_info,
+        "refresh_access_token": refresh_access_token,
+        "swap_token": swap_token,
+        "logout": logout,
+    }
+
+
+@asynccontextmanager
+async def asgi_client(stand_in: GoogleStandIn, secrets_path: str):
+    """In-process app client, app lifespan binds the database."""
+    from api import app
+
+    google_client_config.path = secrets_path
+    google_oauth2_client.certs_url = f"{stand_in.url}/certs"
+    # all load comes from a single client
+    ip_rate_limit.enabled = user_rate_limit.enabled = False
+    await app.router.startup()
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://load", timeout=TIMEOUT
+        ) as client:
+            yield client
+    finally:
+        await app.router.shutdown()
+
+
+async def wait_ready(client: httpx.AsyncClient, process: subprocess.Popen):
+    deadline = monotonic() + 30
+    while monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("uvicorn exited before start")
+        try:
+            await client.get(f"{API}/openapi.json")
+            return
+        except httpx.TransportError:
+            await asyncio.sleep(0.1)
+    raise RuntimeError("uvicorn did not start in 30 seconds")
+
+
+@asynccontextmanager
+async def socket_client(stand_in: GoogleStandIn, secrets_path: str, concurrency: int):
+    """Uvicorn process client, load generator binds the database itself."""
+    port = free_port()
+    env = dict(
+        os.environ,
+        GOOGLE_CLIENT_SECRETS_JSON=secrets_path,
+        GOOGLE_CERTS_URL=f"{stand_in.url}/certs",
+        RATE_LIMIT_ENABLED="false",
+    )
+    process = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "api:app",
+            "--host=127.0.0.1",
+            f"--port={port}",
+            "--log-level=warning",
+            "--no-access-log",
+        ],
+        env=env,
+    )
+    try:
+        async with httpx.AsyncClient(
+            base_url=f"http://127.0.0.1:{port}",
+            limits=httpx.Limits(max_connections=concurrency),
+            timeout=TIMEOUT,
+        ) as client:
+            await wait_ready(client, process)
+            await db.set_bind(DB_DSN)
+            try:
+                yield client
+            finally:
+                await db.pop_bind().close()
+    finally:
+        process.terminate()
+        process.wait()
+
+
+async def run_transport(client_context, args) -> dict:
+    results = {}
+    async with client_context as client:
+        tokens = await create_users(args.concurrency)
+        try:
+            requests = scenarios(client, tokens)
+            for scenario in args.scenarios:
+                result = await generate_load(
+                    requests[scenario], args.requests, args.concurrency
+                )
+                results[scenario] = result.summary()
+        finally:
+            await delete_users()
+    return results
+
+
+def regressions(results: dict, baselines: dict, tolerance: float) -> list:
+    """Scenarios slower than baselines with a tolerance."""
+    failed = []
+    for transport, scenario_results in results.items():
+        for scenario, result in scenario_results.items():
+            baseline = baselines.get(transport, {}).get(scenario)
+            if baseline is None:
+                continue
+            if (baseline["requests"], baseline["concurrency"]) != (
+                result["requests"],
+                result["concurrency"],
+            ):
+                # other load shape, results are not comparable
+                continue
+            if result["rps"] < baseline["rps"] * (1 - tolerance):
+                failed.append(
+                    f"{transport} {scenario}: {result['rps']} req/s, "
+                    f"baseline {baseline['rps']} req/s"
+                )
+            if result["p99_ms"] > baseline["p99_ms"] * (1 + tolerance):
+                failed.append(
+                    f"{transport} {scenario}: p99 {result['p99_ms']}ms, "
+                    f"baseline {baseline['p99_ms']}ms"
+                )
+            if result["errors"]:
+                failed.append(f"{transport} {scenario}: {result['errors']} errors")
+    return failed
+
+
+def report(results: dict):
+    for transport, scenario_results in results.items():
+        for scenario, result in scenario_results.items():
+            sys.stdout.write(
+                f"{transport:6} {scenario:20} {result['rps']:8.1f} req/s  "
+                f"p50 {result['p50_ms']:7.2f}ms  p90 {result['p90_ms']:7.2f}ms  "
+                f"p99 {result['p99_ms']:7.2f}ms  errors {result['errors']}\n"
+            )
+
+
+async def run(args) -> dict:
+    stand_in = GoogleStandIn(users=args.concurrency)
+    stand_in.start()
+    results = {}
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            secrets_path = os.path.join(tmp_dir, "client_secrets.json")
+            stand_in.client_secrets(secrets_path)
+            if "asgi" in args.transport:
+                results["asgi"] = await run_transport(
+                    asgi_client(stand_in, secrets_path), args
+                )
+            if "socket" in args.transport:
+                results["socket"] = await run_transport(
+                    socket_client(stand_in, secrets_path, args.concurrency), args
+                )
+    finally:
+        stand_in.stop()
+    return results
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n", 1)[0])
+    parser.add_argument(
+        "--transport", nargs="+", choices=TRANSPORTS, default=list(TRANSPORTS)
+    )
+    parser.add_argument(
+        "--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS)
+    )
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--baselines", type=Path, default=BASELINES)
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--update-baselines", action="store_true")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    results = asyncio.run(run(args))
+    report(results)
+
+    if args.update_baselines:
+        write_baselines(args.baselines, results)
+        return 0
+
+    baselines = read_baselines(args.baselines)
+    if not baselines:
+        sys.stdout.write(f"No baselines at {args.baselines}, nothing to compare.\n")
+        return 0
+    return report_regressions(regressions(results, baselines, args.tolerance))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
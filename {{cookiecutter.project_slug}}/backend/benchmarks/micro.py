@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""Per-request CPU work microbenchmarks.
+
+Tokens (HMAC and key pairs), schemas validation, JSON:API serialization and
+rate limit timings are compared with stored baselines of the same Python
+version, the exit code is 1 if any of them is slower past the tolerance:
+
+    python -m benchmarks.micro --update-baselines
+    python -m benchmarks.micro
+
+Baselines are machine specific and are not committed, without them results
+are only reported. Database is not needed, SECRET_KEY should be set.
+"""
+
+import argparse
+import sys
+from datetime import datetime, timezone
+from functools import partial
+from pathlib import Path
+from uuid import uuid4
+
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519, rsa
+from jose import jwt
+
+from core.config import ALGORITHM, SECRET_KEY
+from core.database import UserGinoModel
+from core.schemas import AccessToken, RefreshToken, Token, UserDBDataModel
+from core.utils import TokenBuckets
+from core.utils.jwk import KeySet, SigningKey
+
+from . import (
+    BASELINES_DIR,
+    measure,
+    read_baselines,
+    report_regressions,
+    write_baselines,
+)
+
+BASELINES = BASELINES_DIR / "micro.json"
+
+
+def user() -> UserGinoModel:
+    return UserGinoModel(
+        id=uuid4(),
+        ext_id="1" * 21,
+        disabled=False,
+        superuser=False,
+        created=datetime.now(timezone.utc),
+        username="username",
+        given_name="given",
+        family_name="family",
+        full_name="full name",
+    )
+
+
+def key_sets() -> dict:
+    """Access token key pairs by algorithm."""
+    private_keys = [
+        rsa.generate_private_key(public_exponent=65537, key_size=2048),
+        ec.generate_private_key(ec.SECP256R1()),
+        ed25519.Ed25519PrivateKey.generate(),
+    ]
+    return {
+        keys.algorithm: keys
+        for keys in (KeySet([SigningKey(key)]) for key in private_keys)
+    }
+
+
+def targets() -> dict:
+    """Benchmarked callables by name."""
+    user_obj = user()
+    access_token = user_obj.create_access_token()
+    # same claims as a refresh token, which is stored in a database
+    refresh_token = access_token
+    claims = jwt.get_unverified_claims(access_token)
+    # never runs out of tokens, so every call takes one
+    buckets = TokenBuckets(rate=1e9, burst=10 ** 9)
+    token = {
+        "access_token": access_token,
+        "refresh_token": refresh_token,
+        "token_type": "bearer",
+        "alg": ALGORITHM,
+        "typ": "JWT",
+    }
+    return {
+        "User.create_access_token": user_obj.create_access_token,
+        "RefreshToken.decode_and_create": lambda: RefreshToken.decode_and_create(
+            refresh_token
+        ),
+        "AccessToken.decode_and_create": lambda: AccessToken.decode_and_create(
+            access_token
+        ),
+        # python-jose decode and a model validation, as before AccessToken.verify
+        "jose.jwt.decode, AccessToken": lambda: AccessToken(
+            **jwt.decode(access_token, SECRET_KEY, algorithms=[ALGORITHM])
+        ),
+        "AccessToken.verify": lambda: AccessToken.verify(access_token),
+        "Token": lambda: Token(**token),
+        "JsonApiGinoModel.data": lambda: user_obj.data,
+        "UserDBDataModel.from_orm": lambda: UserDBDataModel.from_orm(user_obj),
+        "TokenBuckets.take": lambda: buckets.take(user_obj.id),
+        **{
+            f"KeySet.decode {algorithm}": partial(keys.decode, keys.encode(claims))
+            for algorithm, keys in key_sets().items()
+        },
+    }
+
+
+def run(number: int, repeat: int) -> dict:
+    """Microseconds per call by target."""
+    return {
+        name: {"us": round(measure(func, number=number, repeat=repeat) * 1e6, 2)}
+        for name, func in targets().items()
+    }
+
+
+def regressions(results: dict, baselines: dict, tolerance: float) -> list:
+    failed = []
+    for name, result in results.items():
+        baseline = baselines.get(name)
+        if baseline and result["us"] > baseline["us"] * (1 + tolerance):
+            failed.append(f"{name}: {result['us']}us, baseline {baseline['us']}us")
+    return failed
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n", 1)[0])
+    parser.add_argument("--number", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--baselines", type=Path, default=BASELINES)
+    parser.add_argument("--tolerance", type=float, default=0.3)
+    parser.add_argument("--update-baselines", action="store_true")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    results = run(args.number, args.repeat)
+    for name, result in results.items():
+        sys.stdout.write(f"{name:32} {result['us']:9.2f}us\n")
+
+    # CPU work timings depend on the interpreter version
+    group = f"python{sys.version_info.major}.{sys.version_info.minor}"
+    if args.update_baselines:
+        write_baselines(args.baselines, {group: results})
+        return 0
+
+    baselines = read_baselines(args.baselines).get(group)
+    if not baselines:
+        sys.stdout.write(f"No {group} baselines at {args.baselines}.\n")
+        return 0
+    return report_regressions(regressions(results, baselines, args.tolerance))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
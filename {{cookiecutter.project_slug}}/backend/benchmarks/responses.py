@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""Default response class benchmark.
+
+Compares FastAPI JSONResponse with an orjson JsonApiResponse on
+`/api/v1/user/info`, current user dependency is overridden,
+so a database is not needed.
+"""
+
+import asyncio
+from datetime import datetime, timezone
+from uuid import uuid4
+
+import httpx
+from fastapi import FastAPI
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from fastapi_versioning import VersionedFastAPI
+
+from api.v1 import security_router
+from core.database import UserGinoModel
+from core.schemas import UserDBDataModel
+from core.services.security import get_current_user
+from core.utils import JsonApiResponse
+
+from . import ameasure, measure, report
+
+USER = UserGinoModel(
+    id=uuid4(),
+    ext_id="1" * 21,
+    disabled=False,
+    superuser=False,
+    created=datetime.now(timezone.utc),
+    username="username",
+    given_name="given",
+    family_name="family",
+    full_name="full name",
+)
+
+
+def versioned_app(response_class) -> FastAPI:
+    """Project versioned app with a given default response class."""
+    application = FastAPI(default_response_class=response_class)
+    application.include_router(security_router)
+    application.dependency_overrides[get_current_user] = lambda: USER
+    return VersionedFastAPI(
+        application,
+        version_format="{major}",
+        prefix_format="/api/v{major}",
+        default_response_class=response_class,
+    )
+
+
+async def user_info(response_class) -> float:
+    transport = httpx.ASGITransport(app=versioned_app(response_class))
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+
+        async def request():
+            response = await client.get("/api/v1/user/info")
+            response.raise_for_status()
+
+        return await ameasure(request, number=500)
+
+
+def main():
+    content = UserDBDataModel(data=USER.data)
+    report(
+        "encode and render",
+        measure(lambda: JSONResponse(jsonable_encoder(content)), number=5000),
+        measure(lambda: JsonApiResponse(content.dict()), number=5000),
+    )
+    report(
+        "GET /api/v1/user/info",
+        asyncio.run(user_info(JSONResponse)),
+        asyncio.run(user_info(JsonApiResponse)),
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""Worker startup benchmark.
+
+`import core.database` (alembic and CLI tools), `import api` and the app
+construction are timed in fresh interpreters, the best of `--repeat` runs.
+The exit code is 1 if any of them is over its budget or if heavy login-only
+dependencies were imported on startup:
+
+    python -m benchmarks.startup
+    python -m benchmarks.startup --scale 2
+
+Database is not needed, SECRET_KEY should be set.
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+from . import report_regressions
+
+BACKEND_DIR = Path(__file__).parent.parent
+OAUTH_MODULES = (
+    "google_auth_oauthlib",
+    "google.oauth2",
+    "google.auth.transport.requests",
+    "oauthlib",
+)
+# imported on the first use, never on startup
+LAZY_MODULES = {
+    "import core.database": ("jose", "passlib", *OAUTH_MODULES),
+    "import api": ("jose", "passlib", *OAUTH_MODULES),
+}
+# seconds, stages are timed one after another in the same interpreter,
+# a warm file system cache startup takes about a half of them
+BUDGETS = {"import core.database": 0.8, "import api": 0.25, "create_app()": 0.05}
+PROBE = """
+import json
+import sys
+from time import perf_counter
+
+timings, modules = {}, {}
+started = perf_counter()
+import core.database
+timings["import core.database"] = perf_counter() - started
+modules["import core.database"] = list(sys.modules)
+started = perf_counter()
+import api
+timings["import api"] = perf_counter() - started
+modules["import api"] = list(sys.modules)
+started = perf_counter()
+api.create_app()
+timings["create_app()"] = perf_counter() - started
+json.dump({"timings": timings, "modules": modules}, sys.stdout)
+"""
+
+
+def loaded(modules: list, lazy: tuple) -> list:
+    """Lazy modules (or their submodules) among loaded ones."""
+    return sorted(
+        name
+        for name in lazy
+        if any(module == name or module.startswith(f"{name}.") for module in modules)
+    )
+
+
+def probe() -> dict:
+    """Startup timings and loaded lazy modules of a fresh interpreter."""
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE],
+        cwd=BACKEND_DIR,
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    result = json.loads(output)
+    return {
+        "timings": result["timings"],
+        "lazy": {
+            stage: loaded(result["modules"][stage], lazy)
+            for stage, lazy in LAZY_MODULES.items()
+        },
+    }
+
+
+def run(repeat: int) -> dict:
+    """Best timings of `repeat` fresh interpreters."""
+    results = [probe() for _ in range(repeat)]
+    return {
+        "timings": {
+            stage: min(result["timings"][stage] for result in results)
+            for stage in BUDGETS
+        },
+        "lazy": results[0]["lazy"],
+    }
+
+
+def violations(results: dict, scale: float = 1.0) -> list:
+    failed = [
+        f"{stage}: {timing * 1000:.0f}ms, budget {BUDGETS[stage] * scale * 1000:.0f}ms"
+        for stage, timing in results["timings"].items()
+        if timing > BUDGETS[stage] * scale
+    ]
+    failed.extend(
+        f"{stage} imports {', '.join(modules)}"
+        for stage, modules in results["lazy"].items()
+        if modules
+    )
+    return failed
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n", 1)[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--scale", type=float, default=1.0, help="budgets multiplier for slow hosts"
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    results = run(args.repeat)
+    for stage, timing in results["timings"].items():
+        sys.stdout.write(f"{stage:24} {timing * 1000:7.1f}ms\n")
+    return report_regressions(violations(results, args.scale))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""Refresh token rotation benchmark.
+
+Compares previous `BEGIN/DELETE/INSERT/COMMIT` rotation with a single
+upsert statement under concurrent refreshes. Needs a migrated database
+configured by the usual DB_* environment variables, created users and
+tokens are removed afterwards.
+"""
+
+import asyncio
+import sys
+from time import perf_counter
+
+from core.config import DB_DSN
+from core.database import TokenInfoGinoModel, UserGinoModel, db
+from core.database.models.security.auth import hmac_hash
+
+from . import report
+
+USERS = 20
+CONCURRENCY = 50
+ROTATIONS = 2000
+
+
+async def legacy_rotation(user_id, token_hash):
+    """Previous TokenInfo.add_token implementation without hashing."""
+    async with db.transaction():
+        await TokenInfoGinoModel.delete.where(
+            TokenInfoGinoModel.user_id == user_id
+        ).gino.status()
+        await TokenInfoGinoModel.create(user_id=user_id, refresh_token=token_hash)
+
+
+async def upsert_rotation(user_id, token_hash):
+    await TokenInfoGinoModel.set_token_hash(user_id, token_hash)
+
+
+async def run(rotation, user_ids) -> tuple:
+    """Run ROTATIONS rotations by CONCURRENCY workers.
+
+    Users are shared between workers, so the same user token is rotated
+    concurrently like on a parallel refreshes from several browser tabs.
+    Returns elapsed seconds and a number of failed rotations.
+    """
+    token_hash = hmac_hash("benchmark")
+    counter = iter(range(ROTATIONS))
+    errors = 0
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            try:
+                await rotation(user_ids[i % len(user_ids)], token_hash)
+            except Exception:  # noqa: B902
+                errors += 1
+
+    started = perf_counter()
+    await asyncio.gather(*(worker() for _ in range(CONCURRENCY)))
+    return perf_counter() - started, errors
+
+
+async def main():
+    await db.set_bind(DB_DSN, min_size=CONCURRENCY, max_size=CONCURRENCY)
+    users = [
+        await UserGinoModel.create(ext_id=f"benchmark-{i}", username=f"bench-{i}")
+        for i in range(USERS)
+    ]
+    user_ids = [user.id for user in users]
+    try:
+        legacy, legacy_errors = await run(legacy_rotation, user_ids)
+        upsert, upsert_errors = await run(upsert_rotation, user_ids)
+    finally:
+        await UserGinoModel.delete.where(UserGinoModel.id.in_(user_ids)).gino.status()
+        await db.pop_bind().close()
+    report(
+        f"rotation x{ROTATIONS}, {CONCURRENCY} concurrent",
+        legacy / ROTATIONS,
+        upsert / ROTATIONS,
+    )
+    sys.stdout.write(f"failed rotations: {legacy_errors} -> {upsert_errors}\n")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,11 +1,41 @@
 # -*- coding: utf-8 -*-
 """Project configuration file (Starlette)."""
 
+import os
+
 from sqlalchemy.engine.url import URL, make_url
 from starlette.config import Config
-from starlette.datastructures import Secret
+from starlette.datastructures import CommaSeparatedStrings, Secret
 
 config = Config(".env")
+
+
+def non_negative_float(value) -> float:
+    """Config cast that rejects negative numbers."""
+    number = float(value)
+    if number < 0:
+        raise ValueError(value)
+    return number
+
+
+def positive_int(value) -> int:
+    """Config cast that rejects zero and negative numbers."""
+    number = int(value)
+    if number < 1:
+        raise ValueError(value)
+    return number
+
+
+def check_refresh_token_hash(scheme: str, key: str):
+    """Known refresh tokens hash scheme, hmac-sha256 needs a key."""
+    if scheme not in ("bcrypt", "hmac-sha256"):
+        raise ValueError(f"Unknown refresh token hash scheme: {scheme}")
+    if scheme == "hmac-sha256" and not key:
+        raise ValueError(
+            "REFRESH_TOKEN_HASH_KEY or SECRET_KEY is required for hmac-sha256."
+        )
+
+
 # Gino
 DB_DRIVER = config("DB_DRIVER", default="postgresql")
 DB_HOST = config("DB_HOST", default=None)
@@ -34,21 +64,111 @@ DB_USE_CONNECTION_FOR_REQUEST = config(
 )
 DB_RETRY_LIMIT = config("DB_RETRY_LIMIT", cast=int, default=1)
 DB_RETRY_INTERVAL = config("DB_RETRY_INTERVAL", cast=int, default=1)
+# connections opened on startup, before the app is ready
+DB_POOL_WARM_UP_SIZE = config("DB_POOL_WARM_UP_SIZE", cast=int, default=4)
+# idle connections above the pool floor are closed after this time (seconds)
+DB_POOL_MAX_INACTIVE_LIFETIME = config(
+    "DB_POOL_MAX_INACTIVE_LIFETIME", cast=float, default=300
+)
+# pool floor moves between DB_POOL_MIN_SIZE and DB_POOL_MAX_SIZE by acquire wait
+DB_POOL_ADAPTIVE = config("DB_POOL_ADAPTIVE", cast=bool, default=True)
+DB_POOL_RESIZE_INTERVAL = config("DB_POOL_RESIZE_INTERVAL", cast=float, default=10)
+DB_POOL_GROW_WAIT = config("DB_POOL_GROW_WAIT", cast=float, default=0.005)
+# named prepared statements cache of every connection, disable it behind pgbouncer
+# in a transaction pooling mode
+DB_PREPARED_STATEMENTS = config("DB_PREPARED_STATEMENTS", cast=bool, default=True)
+# per-request queries Server-Timing header and slow queries log (seconds, 0 disables)
+DB_QUERY_TIMING = config("DB_QUERY_TIMING", cast=bool, default=True)
+DB_SLOW_QUERY_THRESHOLD = config("DB_SLOW_QUERY_THRESHOLD", cast=float, default=0.5)
+# read replicas DSNs (comma separated), all reads go to the primary if empty
+DB_REPLICA_DSNS = config("DB_REPLICA_DSNS", cast=CommaSeparatedStrings, default="")
+# round_robin or least_loaded (fewest connections in use)
+DB_REPLICA_BALANCE = config("DB_REPLICA_BALANCE", default="round_robin")
+# reads of a recently written user go to the primary, covers the replication lag
+DB_REPLICA_STICKY_SECONDS = config("DB_REPLICA_STICKY_SECONDS", cast=float, default=5)
+# unavailable replica is skipped for this time (seconds)
+DB_REPLICA_RETRY_INTERVAL = config("DB_REPLICA_RETRY_INTERVAL", cast=float, default=5)
 # uvicorn
 API_HOST = config("API_HOST", default="127.0.0.1")
 API_PORT = config("API_PORT", cast=int, default=8000)
 API_DOMAIN = config("API_DOMAIN", default="localhost")
 API_PROTOCOL = config("API_PROTOCOL", default="https")
 API_LOCATION = f"{API_PROTOCOL}://{API_DOMAIN}:{API_PORT}"
+# production server (server.py), workers default to the CPU count
+API_WORKERS = config("API_WORKERS", cast=int, default=os.cpu_count() or 1)
+API_KEEPALIVE = config("API_KEEPALIVE", cast=int, default=5)
+API_BACKLOG = config("API_BACKLOG", cast=int, default=2048)
+API_LIMIT_CONCURRENCY = config("API_LIMIT_CONCURRENCY", cast=int, default=None)
+# HTTP parser: httptools, h11 or auto (httptools if it is installed)
+API_HTTP = config("API_HTTP", default="auto")
+API_GRACEFUL_TIMEOUT = config("API_GRACEFUL_TIMEOUT", cast=int, default=30)
+# restart a worker after a number of requests (+ random jitter), 0 disables it
+API_MAX_REQUESTS = config("API_MAX_REQUESTS", cast=int, default=0)
+API_MAX_REQUESTS_JITTER = config("API_MAX_REQUESTS_JITTER", cast=int, default=0)
+# default response class: json_api (orjson, application/vnd.api+json) or json
+API_RESPONSE_CLASS = config("API_RESPONSE_CLASS", default="json_api")
+# prometheus metrics, set PROMETHEUS_MULTIPROC_DIR for a several workers
+METRICS_ENABLED = config("METRICS_ENABLED", cast=bool, default=True)
+METRICS_ENDPOINT = config("METRICS_ENDPOINT", default="/metrics")
+METRICS_POOL_SAMPLE_INTERVAL = config(
+    "METRICS_POOL_SAMPLE_INTERVAL", cast=float, default=5
+)
 # Google OAuth2 configuration
 GOOGLE_CLIENT_ID = config("GOOGLE_CLIENT_ID", default=None)
 GOOGLE_CLIENT_SECRETS_JSON = config("GOOGLE_CLIENT_SECRETS_JSON", default=None)
 GOOGLE_USERINFO_SCOPE = config("GOOGLE_USERINFO_SCOPE", default=None)
 GOOGLE_SCOPES = [GOOGLE_USERINFO_SCOPE]
+GOOGLE_CERTS_URL = config(
+    "GOOGLE_CERTS_URL", default="https://www.googleapis.com/oauth2/v1/certs"
+)
+GOOGLE_HTTP_TIMEOUT = config("GOOGLE_HTTP_TIMEOUT", cast=float, default=10)
+# unknown ID token key ids refetch Google certs at most once per interval
+GOOGLE_CERTS_REFETCH_INTERVAL = config(
+    "GOOGLE_CERTS_REFETCH_INTERVAL", cast=float, default=60
+)
+GOOGLE_CLIENT_SECRETS_CHECK_INTERVAL = config(
+    "GOOGLE_CLIENT_SECRETS_CHECK_INTERVAL", cast=float, default=10
+)
 # security
 LOGIN_ENDPOINT = "/api/v1/login"
 SWAP_TOKEN_ENDPOINT = "/api/v1/swap_token"
 SECRET_KEY = config("SECRET_KEY", default=None)
 ALGORITHM = config("ALGORITHM", default="HS256")
 ACCESS_TOKEN_EXPIRE_MIN = config("ACCESS_TOKEN_EXPIRE_MIN", default=30)
+# comma separated paths to PEM private key files (RS256, ES256 or EdDSA by a key
+# type) to sign access tokens instead of SECRET_KEY, the first one signs tokens,
+# all of them are published as JWKS
+ACCESS_TOKEN_KEYS = config("ACCESS_TOKEN_KEYS", cast=CommaSeparatedStrings, default="")
+JWKS_ENDPOINT = config("JWKS_ENDPOINT", default="/.well-known/jwks.json")
+JWKS_MAX_AGE = config("JWKS_MAX_AGE", cast=int, default=3600)
 REFRESH_TOKEN_EXPIRE_DAYS = config("REFRESH_TOKEN_EXPIRE_DAYS", default=7)
+# refresh tokens hashing: bcrypt or hmac-sha256, bcrypt rows are still verified
+REFRESH_TOKEN_HASH_SCHEME = config("REFRESH_TOKEN_HASH_SCHEME", default="bcrypt")
+REFRESH_TOKEN_HASH_KEY = config("REFRESH_TOKEN_HASH_KEY", default=SECRET_KEY)
+check_refresh_token_hash(REFRESH_TOKEN_HASH_SCHEME, REFRESH_TOKEN_HASH_KEY)
+# bcrypt executor: thread, process or none
+REFRESH_TOKEN_HASH_EXECUTOR = config("REFRESH_TOKEN_HASH_EXECUTOR", default="thread")
+REFRESH_TOKEN_HASH_WORKERS = config(
+    "REFRESH_TOKEN_HASH_WORKERS", cast=int, default=None
+)
+# per-worker authenticated users cache, 0 disables it
+USER_CACHE_MAX_SIZE = config("USER_CACHE_MAX_SIZE", cast=int, default=1024)
+USER_CACHE_TTL = config("USER_CACHE_TTL", cast=float, default=30)
+# most users returned by a single batch lookup
+USERS_BATCH_MAX_SIZE = config("USERS_BATCH_MAX_SIZE", cast=int, default=100)
+# stateless access tokens carry user attributes and skip the users table
+AUTH_STATELESS = config("AUTH_STATELESS", cast=bool, default=False)
+REVOKED_USERS_REFRESH_INTERVAL = config(
+    "REVOKED_USERS_REFRESH_INTERVAL", cast=float, default=30
+)
+REVOKED_USERS_ERROR_RATE = config("REVOKED_USERS_ERROR_RATE", cast=float, default=0.01)
+# swap and refresh token rate limits per worker, token buckets: burst requests
+# at once and rate per second after that, by client IP and by user, 0 rate
+# disables a limit
+RATE_LIMIT_ENABLED = config("RATE_LIMIT_ENABLED", cast=bool, default=True)
+RATE_LIMIT_IP_RATE = config("RATE_LIMIT_IP_RATE", cast=non_negative_float, default=1)
+RATE_LIMIT_IP_BURST = config("RATE_LIMIT_IP_BURST", cast=positive_int, default=20)
+RATE_LIMIT_USER_RATE = config(
+    "RATE_LIMIT_USER_RATE", cast=non_negative_float, default=0.1
+)
+RATE_LIMIT_USER_BURST = config("RATE_LIMIT_USER_BURST", cast=positive_int, default=5)
@@ -1,8 +1,8 @@
 # -*- coding: utf-8 -*-
 """Project database configuration."""
 
-from .models import db
+from .models import db, replicas
 from .models.security import TokenInfo as TokenInfoGinoModel
 from .models.security import User as UserGinoModel
 
-__all__ = ["UserGinoModel", "TokenInfoGinoModel", "db"]
+__all__ = ["UserGinoModel", "TokenInfoGinoModel", "db", "replicas"]
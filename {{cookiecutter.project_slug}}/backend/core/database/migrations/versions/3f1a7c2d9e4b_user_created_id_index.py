@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+"""User (created, id) index for a keyset pagination.
+
+Revision ID: 3f1a7c2d9e4b
+Revises: 85b9bef9bbee
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "3f1a7c2d9e4b"
+down_revision = "85b9bef9bbee"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """Apply changes on database."""
+    op.create_index("ix_user_created_id", "user", ["created", "id"], unique=False)
+
+
+def downgrade():
+    """Revert changes on database."""
+    op.drop_index("ix_user_created_id", table_name="user")
@@ -4,6 +4,19 @@
 from gino_starlette import Gino
 
 from ... import config
+from ...utils import ReadReplicas
+
+# extra asyncpg pool options, connections are opened before the app is ready
+pool_options = {
+    "init_size": min(
+        max(config.DB_POOL_WARM_UP_SIZE, config.DB_POOL_MIN_SIZE),
+        config.DB_POOL_MAX_SIZE,
+    ),
+    "max_inactive_connection_lifetime": config.DB_POOL_MAX_INACTIVE_LIFETIME,
+}
+if not config.DB_PREPARED_STATEMENTS:
+    # unnamed statements are parsed on every execution and don't outlive it
+    pool_options["statement_cache_size"] = 0
 
 db = Gino(
     dsn=config.DB_DSN,
@@ -14,4 +27,16 @@ db = Gino(
     use_connection_for_request=config.DB_USE_CONNECTION_FOR_REQUEST,
     retry_limit=config.DB_RETRY_LIMIT,
     retry_interval=config.DB_RETRY_INTERVAL,
+    kwargs=pool_options,
+)
+replicas = ReadReplicas(
+    dsns=config.DB_REPLICA_DSNS,
+    balance=config.DB_REPLICA_BALANCE,
+    sticky_seconds=config.DB_REPLICA_STICKY_SECONDS,
+    retry_interval=config.DB_REPLICA_RETRY_INTERVAL,
+    min_size=config.DB_POOL_MIN_SIZE,
+    max_size=config.DB_POOL_MAX_SIZE,
+    echo=config.DB_ECHO,
+    ssl=config.DB_SSL,
+    **pool_options,
 )
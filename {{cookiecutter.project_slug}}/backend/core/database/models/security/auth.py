@@ -3,28 +3,100 @@
 
 from __future__ import annotations
 
+import hmac
 from datetime import datetime, timedelta
+from functools import lru_cache
+from hashlib import sha256
+from types import MappingProxyType
+from typing import Iterable, NamedTuple, Optional
 from uuid import uuid4
 
-from jose import jwt
-from passlib.context import CryptContext
-from sqlalchemy.dialects.postgresql import UUID
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import UUID, insert
+from sqlalchemy.schema import CreateTable
 from sqlalchemy.sql import func
 
 from core.config import (
     ACCESS_TOKEN_EXPIRE_MIN,
-    ALGORITHM,
+    AUTH_STATELESS,
     REFRESH_TOKEN_EXPIRE_DAYS,
-    SECRET_KEY,
+    REFRESH_TOKEN_HASH_EXECUTOR,
+    REFRESH_TOKEN_HASH_KEY,
+    REFRESH_TOKEN_HASH_SCHEME,
+    REFRESH_TOKEN_HASH_WORKERS,
+    USER_CACHE_MAX_SIZE,
+    USER_CACHE_TTL,
 )
-from core.utils import CREDENTIALS_EX, JsonApiGinoModel
+from core.schemas import AccessToken, RefreshToken
+from core.utils import (
+    CREDENTIALS_EX,
+    CompiledGetGinoModel,
+    CompiledQuery,
+    CPUBoundExecutor,
+    JsonApiGinoModel,
+    TTLCache,
+)
+
+from .. import db, replicas
+
+user_cache = TTLCache(maxsize=USER_CACHE_MAX_SIZE, ttl=USER_CACHE_TTL)
+hash_executor = CPUBoundExecutor(
+    kind=REFRESH_TOKEN_HASH_EXECUTOR, max_workers=REFRESH_TOKEN_HASH_WORKERS
+)
+HMAC_SHA256_PREFIX = "$hmac-sha256$"
+PROFILE_FIELDS = ("username", "family_name", "given_name", "full_name")
+# bulk import staging table, not a part of the models metadata and migrations
+user_import = sa.Table(
+    "user_import",
+    sa.MetaData(),
+    sa.Column("id", UUID(), nullable=False),
+    sa.Column("ext_id", sa.Unicode(length=255), nullable=False),
+    sa.Column("username", sa.Unicode(length=255), nullable=False),
+    *(sa.Column(key, sa.Unicode(length=255)) for key in PROFILE_FIELDS[1:]),
+    prefixes=["TEMPORARY"],
+    postgresql_on_commit="DROP",
+)
+IMPORT_COLUMNS = ("id", "ext_id", *PROFILE_FIELDS)
+
+
+class ImportResult(NamedTuple):
+    """Bulk import counters, rows with the same ext_id are merged into one."""
+
+    rows: int
+    inserted: int
+    updated: int
+
+
+# passlib is imported on the first bcrypt hash, not by alembic and CLI tools
+@lru_cache(maxsize=None)
+def ref_token_context():
+    """Bcrypt passlib context."""
+    from passlib.context import CryptContext
+
+    return CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
+def bcrypt_hash(token: str) -> str:
+    """Slow salted hash, module level function to be picklable."""
+    return ref_token_context().hash(token)
+
+
+def bcrypt_verify(token: str, token_hash: str) -> bool:
+    """Verify slow salted hash, module level function to be picklable."""
+    return ref_token_context().verify(token, token_hash)
 
-from .. import db
 
-ref_token_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+def hmac_hash(token: str) -> str:
+    """Keyed fast hash.
 
+    Refresh tokens are random signed JWT, not passwords,
+    so there is nothing to brute force and no need in a slow hash.
+    """
+    digest = hmac.new(REFRESH_TOKEN_HASH_KEY.encode(), token.encode(), sha256)
+    return f"{HMAC_SHA256_PREFIX}{digest.hexdigest()}"
 
-class User(db.Model, JsonApiGinoModel):
+
+class User(CompiledGetGinoModel, db.Model, JsonApiGinoModel):
     """Yep, this is a User table."""
 
     __tablename__ = "user"
@@ -41,6 +113,14 @@ class User(db.Model, JsonApiGinoModel):
     family_name = db.Column(db.Unicode(length=255), nullable=True)
     full_name = db.Column(db.Unicode(length=255), nullable=True)
 
+    # keyset pagination sort key
+    _created_id_idx = db.Index("ix_user_created_id", "created", "id")
+    _upsert_by_ext_id = CompiledQuery(db, lambda: User.upsert_by_ext_id_query())
+    _get_by_ext_id = CompiledQuery(
+        db, lambda: User.query.where(User.ext_id == db.bindparam("sub"))
+    )
+    _import = CompiledQuery(db, lambda: User.import_query())
+
     @property
     def id_str(self):
         """Str representation for a self.id."""
@@ -50,6 +130,33 @@ class User(db.Model, JsonApiGinoModel):
     def active(self):
         return not self.disabled
 
+    @property
+    def token_claims(self) -> dict:
+        """User attributes for a stateless access token."""
+        return {
+            "ext_id": self.ext_id,
+            "superuser": self.superuser,
+            "created": self.created.isoformat(),
+            "given_name": self.given_name,
+            "family_name": self.family_name,
+            "full_name": self.full_name,
+        }
+
+    @classmethod
+    def from_token_claims(cls, ident, claims: dict) -> User:
+        """Restore user from a stateless access token without a db query."""
+        return cls(
+            id=ident,
+            ext_id=claims["ext_id"],
+            disabled=False,
+            superuser=claims["superuser"],
+            created=datetime.fromisoformat(claims["created"]),
+            username=claims["username"],
+            given_name=claims["given_name"],
+            family_name=claims["family_name"],
+            full_name=claims["full_name"],
+        )
+
     def create_access_token(self):
         """Create for a user new access token."""
         token_data = {
@@ -57,7 +164,9 @@ class User(db.Model, JsonApiGinoModel):
             "id": self.id_str,
             "username": self.username,
         }
-        return jwt.encode(token_data, SECRET_KEY, algorithm=ALGORITHM)
+        if AUTH_STATELESS:
+            token_data.update(self.token_claims)
+        return AccessToken.encode(token_data)
 
     async def create_refresh_token(self):
         """Create for a user new refresh token."""
@@ -66,13 +175,15 @@ class User(db.Model, JsonApiGinoModel):
             "id": self.id_str,
             "username": self.username,
         }
-        token = jwt.encode(token_data, SECRET_KEY, algorithm=ALGORITHM)
+        token = RefreshToken.encode(token_data)
         await TokenInfo.add_token(user_id=self.id, refresh_token=token)
         return token
 
     async def delete_refresh_token(self):
         """Delete for a user existing refresh token."""
-        return await TokenInfo.delete.where(TokenInfo.user_id == self.id).gino.status()
+        user_cache.pop(self.id)
+        replicas.mark_written(self.id)
+        return await TokenInfo._delete_by_user_id.status(user_id=self.id)
 
     async def create_token(self):
         acc_token = self.create_access_token()
@@ -81,7 +192,7 @@ class User(db.Model, JsonApiGinoModel):
             "access_token": acc_token,
             "refresh_token": ref_token,
             "token_type": "bearer",
-            "alg": ALGORITHM,
+            "alg": AccessToken.algorithm(),
             "typ": "JWT",
         }
 
@@ -92,7 +203,79 @@ class User(db.Model, JsonApiGinoModel):
     async def token_is_valid(self, token: str) -> bool:
         """Checking that the token matches the issued one."""
         token_info = await self.token_info()
-        return token_info and token_info.verify_token(token)
+        return token_info and await token_info.averify_token(token)
+
+    @classmethod
+    def from_values(cls, values) -> User:
+        """New instance of loaded column values, like the Gino loader makes."""
+        user_obj = cls()
+        user_obj.__values__.update(values)
+        return user_obj
+
+    @classmethod
+    async def get_cached(cls, ident) -> Optional[User]:
+        """Get user by id through the per-worker users cache.
+
+        Cache misses are read from a replica if there is any. Cache keeps a
+        read-only copy of the column values and every call gets a new
+        instance, so changes of a request user are not seen by other requests.
+        """
+        values = user_cache.get(ident)
+        if values is None:
+            user_obj = await replicas.get(cls, ident)
+            if user_obj is not None:
+                user_cache.set(user_obj.id, MappingProxyType(dict(user_obj.__values__)))
+            return user_obj
+        return cls.from_values(values)
+
+    @classmethod
+    async def get_batch(cls, idents: list) -> dict:
+        """Users by ids with a single query, read from a replica if there is any."""
+        return await replicas.get_many(cls, idents)
+
+    @classmethod
+    def on_conflict_update(cls, insert_query):
+        """`ON CONFLICT (ext_id) DO UPDATE` of a changed profile of an enabled user."""
+        table = cls.__table__
+        changed = db.tuple_(*(table.c[key] for key in PROFILE_FIELDS)).is_distinct_from(
+            db.tuple_(*(insert_query.excluded[key] for key in PROFILE_FIELDS))
+        )
+        return insert_query.on_conflict_do_update(
+            index_elements=[table.c.ext_id],
+            set_={key: insert_query.excluded[key] for key in PROFILE_FIELDS},
+            where=db.and_(table.c.disabled.is_(False), changed),
+        )
+
+    @classmethod
+    def upsert_by_ext_id_query(cls):
+        """Single `INSERT ... ON CONFLICT (ext_id) DO UPDATE` statement.
+
+        It writes nothing if the profile is not changed or the user is disabled,
+        in these cases existing row is selected by the same statement.
+        """
+        values = {key: db.bindparam(key) for key in PROFILE_FIELDS}
+        table = cls.__table__
+        # python-side defaults are set explicitly, they are not applied to a CTE
+        insert_query = insert(table).values(
+            id=db.bindparam("id"),
+            ext_id=db.bindparam("sub"),
+            disabled=False,
+            superuser=False,
+            **values,
+        )
+        upsert = cls.on_conflict_update(insert_query).returning(*table.c).cte("upsert")
+        return (
+            db.select([upsert])
+            .union_all(
+                db.select([table]).where(
+                    db.and_(
+                        table.c.ext_id == db.bindparam("sub"),
+                        ~db.exists(db.select([upsert.c.id])),
+                    )
+                )
+            )
+            .execution_options(loader=cls)
+        )
 
     @classmethod
     async def insert_or_update_by_ext_id(
@@ -102,32 +285,88 @@ class User(db.Model, JsonApiGinoModel):
         family_name: str = None,
         given_name: str = None,
         full_name: str = None,
-        **__
+        **__,
     ) -> User:
-        """Create new record or update existing."""
-
-        user_obj = await cls.query.where(cls.ext_id == sub).gino.first()
-        if user_obj and user_obj.active:
-            await user_obj.update(
-                username=username,
-                family_name=family_name,
-                given_name=given_name,
-                full_name=full_name,
-            ).apply()
-        elif not user_obj:
-            user_obj = await cls.create(
-                ext_id=sub,
-                username=username,
-                family_name=family_name,
-                given_name=given_name,
-                full_name=full_name,
-            )
-        else:
+        """Create new record or update existing with a single statement."""
+        user_obj = await cls._upsert_by_ext_id.first(
+            id=uuid4(),
+            sub=sub,
+            username=username,
+            family_name=family_name,
+            given_name=given_name,
+            full_name=full_name,
+        )
+        if user_obj is None:
+            # row was inserted by a concurrent transaction after statement start
+            user_obj = await cls._get_by_ext_id.first(sub=sub)
+        if user_obj is None:
+            raise CREDENTIALS_EX
+        # a user disabled outside of the API should not stay cached as enabled
+        user_cache.pop(user_obj.id)
+        replicas.mark_written(user_obj.id)
+        if user_obj.disabled:
             raise CREDENTIALS_EX
         return user_obj
 
+    @classmethod
+    def import_query(cls):
+        """Set-based upsert of the staged profiles, the last one of an ext_id wins.
 
-class TokenInfo(db.Model):
+        Returns staged rows, inserted and updated users counters.
+        """
+        # rows of a new insert only table are stored in the COPY order
+        staged = (
+            db.select(
+                [
+                    *(user_import.c[key] for key in IMPORT_COLUMNS),
+                    db.false(),
+                    db.false(),
+                ]
+            )
+            .distinct(user_import.c.ext_id)
+            .order_by(user_import.c.ext_id, db.literal_column("ctid").desc())
+        )
+        insert_query = insert(cls.__table__).from_select(
+            [*IMPORT_COLUMNS, "disabled", "superuser"], staged
+        )
+        # updated row has a non zero xmax of the replaced version
+        upsert = (
+            cls.on_conflict_update(insert_query)
+            .returning(db.literal_column("xmax = 0", db.Boolean).label("inserted"))
+            .cte("upsert")
+        )
+        return db.select(
+            [
+                db.select([func.count()]).select_from(user_import).as_scalar(),
+                func.count().filter(upsert.c.inserted),
+                func.count().filter(~upsert.c.inserted),
+            ]
+        ).select_from(upsert)
+
+    @classmethod
+    async def import_profiles(cls, profiles: Iterable[dict]) -> ImportResult:
+        """Create new and update existing users by ext_id in bulk.
+
+        Profiles are streamed with a binary COPY into a temporary table and
+        merged into users by a single statement in the same transaction, so
+        memory use doesn't depend on the number of profiles and a failed
+        import changes nothing. Disabled users are not updated. Profiles should
+        have `ext_id` and `username`, other fields are optional.
+        """
+        records = (
+            (uuid4(), *(profile.get(key) for key in IMPORT_COLUMNS[1:]))
+            for profile in profiles
+        )
+        async with db.acquire() as conn:
+            async with conn.transaction():
+                await conn.status(CreateTable(user_import))
+                await conn.raw_connection.copy_records_to_table(
+                    user_import.name, records=records, columns=IMPORT_COLUMNS
+                )
+                return ImportResult(*await cls._import.first(bind=conn))
+
+
+class TokenInfo(CompiledGetGinoModel, db.Model):
     """Token information, such as user to whom token was claimed."""
 
     __tablename__ = "token_info"
@@ -140,20 +379,63 @@ class TokenInfo(db.Model):
         db.DateTime(timezone=True), server_default=func.now(), nullable=False
     )
 
+    _set_token_hash = CompiledQuery(db, lambda: TokenInfo.set_token_hash_query())
+    _delete_by_user_id = CompiledQuery(
+        db, lambda: TokenInfo.delete.where(TokenInfo.user_id == db.bindparam("user_id"))
+    )
+
     @staticmethod
     def get_refresh_token_hash(token: str):
         """Hash plain token str."""
-        return ref_token_context.hash(token)
+        if REFRESH_TOKEN_HASH_SCHEME == "hmac-sha256":
+            return hmac_hash(token)
+        return bcrypt_hash(token)
+
+    @staticmethod
+    async def hash_token(token: str):
+        """Hash plain token str without blocking event loop."""
+        if REFRESH_TOKEN_HASH_SCHEME == "hmac-sha256":
+            return hmac_hash(token)
+        return await hash_executor.run(bcrypt_hash, token)
 
     @classmethod
     async def add_token(cls, user_id: UUID, refresh_token: str):
-        """Add new refresh_token for a user."""
-        async with db.transaction():
-            await cls.delete.where(cls.user_id == user_id).gino.status()
-            await cls.create(
-                user_id=user_id, refresh_token=cls.get_refresh_token_hash(refresh_token)
-            )
+        """Add new refresh_token for a user.
+
+        Every token rotation stores hash with a configured scheme,
+        so existing bcrypt rows are migrated on the next refresh.
+        """
+        token_hash = await cls.hash_token(refresh_token)
+        await cls.set_token_hash(user_id, token_hash)
+
+    @classmethod
+    def set_token_hash_query(cls):
+        """Refresh token hash upsert, user has a single refresh token."""
+        insert_query = insert(cls.__table__).values(
+            user_id=db.bindparam("user_id"), refresh_token=db.bindparam("token_hash")
+        )
+        return insert_query.on_conflict_do_update(
+            index_elements=[cls.user_id],
+            set_={
+                "refresh_token": insert_query.excluded.refresh_token,
+                "created": func.now(),
+            },
+        )
+
+    @classmethod
+    async def set_token_hash(cls, user_id: UUID, token_hash: str):
+        """Replace user refresh token hash with a single atomic upsert."""
+        await cls._set_token_hash.status(user_id=user_id, token_hash=token_hash)
+        replicas.mark_written(user_id)
 
     def verify_token(self, refresh_token: str):
         """Verify plain token text and stored hashed value."""
-        return ref_token_context.verify(refresh_token, self.refresh_token)
+        if self.refresh_token.startswith(HMAC_SHA256_PREFIX):
+            return hmac.compare_digest(hmac_hash(refresh_token), self.refresh_token)
+        return bcrypt_verify(refresh_token, self.refresh_token)
+
+    async def averify_token(self, refresh_token: str):
+        """Verify plain token text without blocking event loop."""
+        if self.refresh_token.startswith(HMAC_SHA256_PREFIX):
+            return self.verify_token(refresh_token)
+        return await hash_executor.run(bcrypt_verify, refresh_token, self.refresh_token)
@@ -9,12 +9,14 @@ from .security import (
     UserDataCreateModel,
     UserDataUpdateModel,
     UserDBDataModel,
+    UserDBListModel,
     UserDBModel,
 )
 
 __all__ = [
     "UserDBModel",
     "UserDBDataModel",
+    "UserDBListModel",
     "UserDataCreateModel",
     "UserDataUpdateModel",
     "Token",
@@ -1,12 +1,19 @@
 # -*- coding: utf-8 -*-
 """Pydantic security models."""
 
-from .auth import UserDataCreateModel, UserDataUpdateModel, UserDBDataModel, UserDBModel
+from .auth import (
+    UserDataCreateModel,
+    UserDataUpdateModel,
+    UserDBDataModel,
+    UserDBListModel,
+    UserDBModel,
+)
 from .oauth2 import AccessToken, GoogleIdInfo, RefreshToken, Token
 
 __all__ = [
     "UserDBModel",
     "UserDBDataModel",
+    "UserDBListModel",
     "UserDataCreateModel",
     "UserDataUpdateModel",
     "Token",
@@ -2,7 +2,8 @@
 """Pydantic User models."""
 
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
+from uuid import UUID
 
 from pydantic import BaseModel
 
@@ -92,3 +93,16 @@ class UserDBDataModel(JsonApiDataDBModel):
     def disabled(self):
         """Interface for UserGinoModel.disabled."""
         return self.data.attributes.disabled
+
+
+class UsersMetaModel(BaseModel):
+    """Users batch lookup meta."""
+
+    missing: List[UUID]
+
+
+class UserDBListModel(BaseModel):
+    """Users collection."""
+
+    data: List[UserDBModel]
+    meta: UsersMetaModel
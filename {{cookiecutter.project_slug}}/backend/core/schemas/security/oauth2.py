@@ -2,32 +2,113 @@
 """Pydantic oauth2 models."""
 
 from datetime import datetime
-from typing import Optional
-from uuid import uuid4
+from functools import lru_cache
+from time import time
+from typing import NamedTuple, Optional
+from uuid import UUID, uuid4
 
-from jose import jwt
-from pydantic import UUID4, BaseModel, EmailStr, SecretStr, conint, constr, validator
+from pydantic import UUID4, BaseModel, EmailStr, SecretStr, constr, validator
 
-from core.config import ALGORITHM, GOOGLE_CLIENT_ID, SECRET_KEY
+from core.config import ACCESS_TOKEN_KEYS, ALGORITHM, GOOGLE_CLIENT_ID, SECRET_KEY
+from core.utils import InvalidTokenError, token_verifier
+
+
+@lru_cache(maxsize=None)
+def jwt_verifier():
+    """Project tokens verifier, HMAC key is prepared once."""
+    return token_verifier(SECRET_KEY, ALGORITHM)
+
+
+@lru_cache(maxsize=None)
+def access_token_keys():
+    """Access tokens key pairs, None if they are signed with SECRET_KEY."""
+    if not ACCESS_TOKEN_KEYS:
+        return None
+    from core.utils.jwk import KeySet
+
+    return KeySet.from_files(ACCESS_TOKEN_KEYS)
+
+
+class TokenIdentity(NamedTuple):
+    """Verified token owner."""
+
+    id: UUID  # noqa: A003, VNE003
+    username: str
 
 
 class RefreshToken(BaseModel):
     id: UUID4  # noqa: A003, VNE003
     username: str
-    exp: conint(gt=datetime.utcnow().timestamp())
+    exp: int
+
+    @validator("exp")
+    def exp_in_future(cls, value):
+        assert value > time(), "Token has expired."
+        return value
+
+    @classmethod
+    def algorithm(cls) -> str:
+        return ALGORITHM
+
+    @classmethod
+    def encode(cls, claims: dict) -> str:
+        """Token signed with SECRET_KEY, python-jose is imported on the first use."""
+        from jose import jwt
+
+        return jwt.encode(claims, SECRET_KEY, algorithm=ALGORITHM)
 
     @classmethod
-    def decode(cls, token: str):
-        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    def decode(cls, token: str) -> dict:
+        """Verified token claims."""
+        return jwt_verifier().decode(token)
 
     @classmethod
     def decode_and_create(cls, token: str):
         decoded_token = cls.decode(token)
         return cls(**decoded_token)
 
+    @classmethod
+    def identity(cls, claims: dict) -> TokenIdentity:
+        """Token owner from a verified claims, without a model validation."""
+        try:
+            ident = UUID(claims["id"])
+            username = claims["username"]
+        except (KeyError, TypeError, AttributeError, ValueError) as exc:
+            raise InvalidTokenError(f"Bad token claims: {exc!r}") from exc
+        if ident.version != 4 or not isinstance(username, str):
+            raise InvalidTokenError("Bad token claims.")
+        return TokenIdentity(ident, username)
+
+    @classmethod
+    def verify(cls, token: str) -> TokenIdentity:
+        """Verify token and get its owner in a single pass.
+
+        Authenticated requests need the owner only, so claims are not
+        validated by a pydantic model.
+        """
+        return cls.identity(cls.decode(token))
+
 
 class AccessToken(RefreshToken):
-    pass
+    """Access token, signed with a key pair if there are any.
+
+    Other services verify them with public keys from the JWKS endpoint.
+    """
+
+    @classmethod
+    def algorithm(cls) -> str:
+        keys = access_token_keys()
+        return keys.algorithm if keys else super().algorithm()
+
+    @classmethod
+    def encode(cls, claims: dict) -> str:
+        keys = access_token_keys()
+        return keys.encode(claims) if keys else super().encode(claims)
+
+    @classmethod
+    def decode(cls, token: str) -> dict:
+        keys = access_token_keys()
+        return keys.decode(token) if keys else super().decode(token)
 
 
 class Token(BaseModel):
@@ -44,7 +125,7 @@ class Token(BaseModel):
 
     @validator("alg")
     def alg_check(cls, value):
-        assert value == ALGORITHM
+        assert value == AccessToken.algorithm()
         return value
 
     @validator("token_type")
@@ -73,7 +154,7 @@ class GoogleIdInfo(BaseModel):
     """
 
     aud: SecretStr
-    exp: conint(gt=datetime.utcnow().timestamp())
+    exp: int
     iat: datetime
     iss: constr(
         regex=r"^(https://accounts\.google\.com|accounts\.google\.com)$"  # noqa: F722
@@ -87,6 +168,11 @@ class GoogleIdInfo(BaseModel):
     locale: Optional[str]
     email: Optional[EmailStr]
 
+    @validator("exp")
+    def exp_in_future(cls, value):
+        assert value > time(), "ID token has expired."
+        return value
+
     @validator("aud")
     def aud_must_equals_gci(cls, value):
         assert value._secret_value == GOOGLE_CLIENT_ID
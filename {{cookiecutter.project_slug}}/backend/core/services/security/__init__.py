@@ -1,6 +1,31 @@
 # -*- coding: utf-8 -*-
 """Project security business logic."""
 
-from .auth import get_current_user, get_or_create_user, get_user_for_refresh
+from .auth import (
+    get_current_user,
+    get_or_create_user,
+    get_stateless_user,
+    get_user_for_refresh,
+)
+from .oauth2 import google_client_config, google_oauth2_client
+from .rate_limit import (
+    ip_rate_limit,
+    limit_by_ip,
+    limit_refresh_by_user,
+    user_rate_limit,
+)
+from .revocation import revoked_users
 
-__all__ = ["get_current_user", "get_or_create_user", "get_user_for_refresh"]
+__all__ = [
+    "get_current_user",
+    "get_or_create_user",
+    "get_stateless_user",
+    "get_user_for_refresh",
+    "google_client_config",
+    "google_oauth2_client",
+    "ip_rate_limit",
+    "limit_by_ip",
+    "limit_refresh_by_user",
+    "user_rate_limit",
+    "revoked_users",
+]
@@ -3,13 +3,14 @@
 
 from fastapi import Depends
 from fastapi.security.oauth2 import OAuth2AuthorizationCodeBearer
-from jose import JWTError
 
-from core.config import LOGIN_ENDPOINT, SWAP_TOKEN_ENDPOINT
+from core.config import AUTH_STATELESS, LOGIN_ENDPOINT, SWAP_TOKEN_ENDPOINT
 from core.database import UserGinoModel
 from core.schemas import AccessToken, GoogleIdInfo, RefreshToken
 from core.utils import CREDENTIALS_EX, INACTIVE_EX
 
+from .revocation import revoked_users
+
 oauth2_scheme = OAuth2AuthorizationCodeBearer(
     authorizationUrl=LOGIN_ENDPOINT, tokenUrl=SWAP_TOKEN_ENDPOINT
 )
@@ -28,14 +29,15 @@ async def get_or_create_user(id_info: GoogleIdInfo):
 
 async def get_user_for_refresh(token: str):
     try:
-        token_info = RefreshToken.decode_and_create(token=token)
+        token_info = RefreshToken.verify(token)
+        # token rotation must see the last issued token, replicas may lag
         user = await UserGinoModel.get(token_info.id)
         if user is None or user.disabled:
             raise INACTIVE_EX
         token_valid = await user.token_is_valid(token)
         if not token_valid:
             raise CREDENTIALS_EX
-    except (JWTError, ValueError):
+    except ValueError:
         raise CREDENTIALS_EX
     return user
 
@@ -51,11 +53,29 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):  # noqa: B008
         ):
             return current_user
     """
+    if AUTH_STATELESS:
+        return await get_stateless_user(token)
     try:
-        token_info = AccessToken.decode_and_create(token=token)
-        user = await UserGinoModel.get(token_info.id)
+        token_info = AccessToken.verify(token)
+        user = await UserGinoModel.get_cached(token_info.id)
         if user is None or user.disabled:
             raise INACTIVE_EX
-    except (JWTError, ValueError):
+    except ValueError:
+        raise CREDENTIALS_EX
+    return user
+
+
+async def get_stateless_user(token: str):
+    """Restore user from a stateless access token claims.
+
+    Database is queried only for revoked users (and filter false positives).
+    """
+    try:
+        claims = AccessToken.decode(token)
+        token_info = AccessToken.identity(claims)
+        if await revoked_users.is_revoked(token_info.id):
+            raise INACTIVE_EX
+        user = UserGinoModel.from_token_claims(token_info.id, claims)
+    except (ValueError, KeyError):
         raise CREDENTIALS_EX
     return user
@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+"""Google OAuth2 client.
+
+Google auth libraries are heavy to import and are used only by the login
+flow, so they are imported on the first use instead of the worker startup.
+"""
+
+import asyncio
+import json
+import os
+import re
+from base64 import urlsafe_b64decode
+from time import monotonic
+from typing import TYPE_CHECKING
+
+import httpx
+
+from core.config import (
+    API_LOCATION,
+    GOOGLE_CERTS_REFETCH_INTERVAL,
+    GOOGLE_CERTS_URL,
+    GOOGLE_CLIENT_SECRETS_CHECK_INTERVAL,
+    GOOGLE_CLIENT_SECRETS_JSON,
+    GOOGLE_HTTP_TIMEOUT,
+    GOOGLE_SCOPES,
+    SWAP_TOKEN_ENDPOINT,
+)
+from core.schemas import GoogleIdInfo
+from core.utils import CREDENTIALS_EX, OAUTH2_EX
+
+if TYPE_CHECKING:
+    from google_auth_oauthlib.flow import Flow as GFlow
+
+MAX_AGE_RE = re.compile(r"max-age=(\d+)")
+
+
+def unverified_key_id(token: str) -> str:
+    """Signing key id from a JWT header, signature is not checked."""
+    header = token.split(".", 1)[0]
+    header = json.loads(urlsafe_b64decode(header + "=" * (-len(header) % 4)))
+    return header.get("kid")
+
+
+class GoogleClientConfig:
+    """Parsed Google client secrets file.
+
+    File is read once on startup and is read again only when its mtime
+    changes, mtime itself is checked at most once per `check_interval` seconds.
+    """
+
+    def __init__(self, path: str, check_interval: float):
+        self.path = path
+        self.check_interval = check_interval
+        self.__config = None
+        self.__mtime = None
+        self.__checked = 0
+
+    def load(self):
+        """Read and parse client secrets file."""
+        mtime = os.stat(self.path).st_mtime_ns
+        with open(self.path) as secrets_file:
+            self.__config = json.load(secrets_file)
+        self.__mtime = mtime
+        self.__checked = monotonic()
+
+    @property
+    def config(self) -> dict:
+        """Client config, reloaded if the file was changed."""
+        if self.__config is None:
+            self.load()
+        elif monotonic() - self.__checked > self.check_interval:
+            self.__checked = monotonic()
+            if os.stat(self.path).st_mtime_ns != self.__mtime:
+                self.load()
+        return self.__config
+
+    def flow(self) -> "GFlow":
+        """New OAuth2 flow built from the parsed client config."""
+        from google_auth_oauthlib.flow import Flow as GFlow
+
+        flow = GFlow.from_client_config(self.config, scopes=GOOGLE_SCOPES)
+        flow.redirect_uri = f"{API_LOCATION}{SWAP_TOKEN_ENDPOINT}"
+        return flow
+
+
+class GoogleOAuth2Client:
+    """Async Google authorization code exchange.
+
+    HTTP connections are pooled and kept alive between logins.
+    ID tokens are verified locally against signing certificates that are
+    cached for the `Cache-Control: max-age` returned by the certs endpoint.
+    Unknown key id refetches them before expiration at most once per
+    `refetch_interval` seconds, so random key ids can't flood Google.
+    """
+
+    def __init__(
+        self,
+        client_config: GoogleClientConfig,
+        certs_url: str,
+        timeout: float,
+        refetch_interval: float = 60,
+    ):
+        self.client_config = client_config
+        self.certs_url = certs_url
+        self.timeout = timeout
+        self.refetch_interval = refetch_interval
+        self.__http = None
+        self.__certs = None
+        self.__certs_expire = 0
+        self.__certs_fetched = None
+        self.__certs_lock = None
+
+    @property
+    def web_config(self) -> dict:
+        """Client secrets of a web (or installed) application."""
+        config = self.client_config.config
+        return config.get("web") or config["installed"]
+
+    @property
+    def http(self) -> httpx.AsyncClient:
+        """Pooled keep-alive HTTP client."""
+        if self.__http is None:
+            self.__http = httpx.AsyncClient(timeout=self.timeout)
+        return self.__http
+
+    async def close(self):
+        """Close pooled connections."""
+        if self.__http is not None:
+            await self.__http.aclose()
+            self.__http = None
+
+    async def certs(self, force: bool = False) -> dict:
+        """Google signing certificates by key id.
+
+        Forced refetch of not expired certificates is skipped within
+        `refetch_interval` of the previous fetch.
+        """
+        if self.__certs_lock is None:
+            self.__certs_lock = asyncio.Lock()
+        async with self.__certs_lock:
+            now = monotonic()
+            if force and self.__certs_fetched is not None:
+                force = now - self.__certs_fetched >= self.refetch_interval
+            if force or self.__certs is None or now >= self.__certs_expire:
+                self.__certs_fetched = now
+                response = await self.http.get(self.certs_url)
+                response.raise_for_status()
+                max_age = MAX_AGE_RE.search(response.headers.get("cache-control", ""))
+                self.__certs = response.json()
+                self.__certs_expire = monotonic() + int(
+                    max_age.group(1) if max_age else 0
+                )
+        return self.__certs
+
+    async def exchange_code(self, code: str) -> dict:
+        """Exchange authorization code for a tokens."""
+        web_config = self.web_config
+        try:
+            response = await self.http.post(
+                web_config["token_uri"],
+                data={
+                    "grant_type": "authorization_code",
+                    "code": code,
+                    "client_id": web_config["client_id"],
+                    "client_secret": web_config["client_secret"],
+                    "redirect_uri": f"{API_LOCATION}{SWAP_TOKEN_ENDPOINT}",
+                },
+            )
+            response.raise_for_status()
+            return response.json()
+        except (httpx.HTTPError, ValueError):
+            raise OAUTH2_EX
+
+    async def verify_id_token(self, id_token: str) -> GoogleIdInfo:
+        """Verify ID token signature and claims with a cached certificates."""
+        from google.auth import jwt as google_jwt
+
+        try:
+            key_id = unverified_key_id(id_token)
+            certs = await self.certs()
+            if key_id not in certs:
+                # keys were rotated before cache expiration
+                certs = await self.certs(force=True)
+                if key_id not in certs:
+                    raise CREDENTIALS_EX
+            id_info = google_jwt.decode(
+                id_token, certs=certs, audience=self.web_config["client_id"]
+            )
+            return GoogleIdInfo(**id_info)
+        except httpx.HTTPError:
+            raise OAUTH2_EX
+        except (ValueError, TypeError, AttributeError):
+            raise CREDENTIALS_EX
+
+    async def authenticate(self, code: str) -> GoogleIdInfo:
+        """Exchange authorization code and verify received ID token."""
+        tokens = await self.exchange_code(code)
+        if "id_token" not in tokens:
+            raise OAUTH2_EX
+        return await self.verify_id_token(tokens["id_token"])
+
+
+google_client_config = GoogleClientConfig(
+    path=GOOGLE_CLIENT_SECRETS_JSON, check_interval=GOOGLE_CLIENT_SECRETS_CHECK_INTERVAL
+)
+google_oauth2_client = GoogleOAuth2Client(
+    client_config=google_client_config,
+    certs_url=GOOGLE_CERTS_URL,
+    timeout=GOOGLE_HTTP_TIMEOUT,
+    refetch_interval=GOOGLE_CERTS_REFETCH_INTERVAL,
+)
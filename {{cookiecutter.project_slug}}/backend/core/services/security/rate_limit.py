@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+"""Auth endpoints rate limits."""
+
+from fastapi import Request
+
+from core.config import (
+    RATE_LIMIT_ENABLED,
+    RATE_LIMIT_IP_BURST,
+    RATE_LIMIT_IP_RATE,
+    RATE_LIMIT_USER_BURST,
+    RATE_LIMIT_USER_RATE,
+)
+from core.schemas import RefreshToken
+from core.utils import RateLimit
+
+ip_rate_limit = RateLimit(
+    rate=RATE_LIMIT_IP_RATE, burst=RATE_LIMIT_IP_BURST, enabled=RATE_LIMIT_ENABLED
+)
+user_rate_limit = RateLimit(
+    rate=RATE_LIMIT_USER_RATE, burst=RATE_LIMIT_USER_BURST, enabled=RATE_LIMIT_ENABLED
+)
+
+
+async def limit_by_ip(request: Request):
+    """Client IP rate limit, behind a proxy uvicorn takes it from X-Forwarded-For."""
+    ip_rate_limit.check(request.client.host if request.client else None)
+
+
+async def limit_refresh_by_user(token: str):
+    """Refresh token owner rate limit, checked before the token hash is verified."""
+    try:
+        user_id = RefreshToken.verify(token).id
+    except ValueError:
+        # invalid token is rejected by get_user_for_refresh
+        return
+    user_rate_limit.check(user_id)
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""Stateless access tokens revocation."""
+
+import asyncio
+import logging
+from uuid import UUID
+
+from core.config import REVOKED_USERS_ERROR_RATE, REVOKED_USERS_REFRESH_INTERVAL
+from core.database import TokenInfoGinoModel, UserGinoModel, db
+from core.utils import UUIDBloomFilter
+
+logger = logging.getLogger(__name__)
+
+
+class RevokedUsers:
+    """Users whose stateless access tokens must be rejected.
+
+    Disabled users and users without an issued refresh token (logged out)
+    are revoked. Their ids are kept in a Bloom filter that is rebuilt from
+    the database every `interval` seconds, so checking a valid user costs
+    no queries. Filter positives are confirmed against the database.
+    """
+
+    def __init__(self, interval: float, error_rate: float):
+        self.interval = interval
+        self.error_rate = error_rate
+        self.__filter = None
+        self.__pending = None
+        self.__task = None
+
+    def add(self, user_id: UUID):
+        """Revoke user tokens on this worker without waiting for a refresh."""
+        if self.__filter is not None:
+            self.__filter.add(user_id)
+        if self.__pending is not None:
+            self.__pending.append(user_id)
+
+    async def is_revoked(self, user_id: UUID) -> bool:
+        """Check that user tokens are revoked."""
+        if self.__filter is not None and user_id not in self.__filter:
+            return False
+        user = await UserGinoModel.get_cached(user_id)
+        return user is None or user.disabled or await user.token_info() is None
+
+    async def refresh(self):
+        """Rebuild revoked users filter from the database."""
+        query = (
+            db.select([UserGinoModel.id])
+            .select_from(UserGinoModel.outerjoin(TokenInfoGinoModel))
+            .where(
+                db.or_(
+                    UserGinoModel.disabled.is_(True),
+                    TokenInfoGinoModel.user_id.is_(None),
+                )
+            )
+        )
+        self.__pending = list()
+        try:
+            rows = await query.gino.all()
+            revoked = UUIDBloomFilter(capacity=len(rows), error_rate=self.error_rate)
+            for (user_id,) in rows:
+                revoked.add(user_id)
+            # logouts that happened while the query was running
+            for user_id in self.__pending:
+                revoked.add(user_id)
+            self.__filter = revoked
+        finally:
+            self.__pending = None
+
+    async def start(self):
+        """Load filter and refresh it periodically."""
+        await self.refresh()
+        self.__task = asyncio.ensure_future(self.__refresh_periodically())
+
+    async def stop(self):
+        """Stop periodical refresh."""
+        if self.__task is not None:
+            self.__task.cancel()
+            self.__task = None
+
+    async def __refresh_periodically(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.refresh()
+            except Exception:  # noqa: B902
+                logger.exception("Revoked users filter refresh failed.")
+
+
+revoked_users = RevokedUsers(
+    interval=REVOKED_USERS_REFRESH_INTERVAL, error_rate=REVOKED_USERS_ERROR_RATE
+)
@@ -1,15 +1,38 @@
 # -*- coding: utf-8 -*-
 """Project extra utils."""
 
+from .bloom_filter import UUIDBloomFilter
+from .cache import TTLCache
+from .etag import ETagRoute
 from .exceptions import (
     CREDENTIALS_EX,
+    CURSOR_EX,
+    FILTER_EX,
+    FILTER_SIZE_EX,
     INACTIVE_EX,
     NOT_AN_OWNER,
     NOT_IMPLEMENTED_EX,
     OAUTH2_EX,
 )
-from .fastapi_pagination import JsonApiPage
-from .gino_models import JsonApiGinoModel
+from .executors import CPUBoundExecutor
+from .fastapi_pagination import (
+    CursorParams,
+    JsonApiCursorPage,
+    JsonApiPage,
+    paginate_by_cursor,
+)
+from .filters import id_filter
+from .gino_models import CompiledGetGinoModel, CompiledQuery, JsonApiGinoModel
+from .jwt import (
+    HMACTokenVerifier,
+    InvalidTokenError,
+    TokenVerifier,
+    jwks_endpoint,
+    token_verifier,
+)
+from .metrics import MetricsMiddleware, PoolMetrics, metrics_endpoint
+from .pool_hooks import PoolHooks
+from .pool_sizing import AdaptivePoolSize
 from .pydantic_models import (
     JsonApiCreateBaseModel,
     JsonApiDataCreateBaseModel,
@@ -18,19 +41,53 @@ from .pydantic_models import (
     JsonApiDBModel,
     JsonApiUpdateBaseModel,
 )
+from .query_timing import QueryTiming, ServerTimingMiddleware
+from .rate_limit import RateLimit, TokenBuckets
+from .replicas import ReadReplicas
+from .responses import RESPONSE_CLASSES, JsonApiResponse
 
 __all__ = [
     "JsonApiPage",
+    "JsonApiResponse",
+    "RESPONSE_CLASSES",
+    "JsonApiCursorPage",
+    "CursorParams",
+    "paginate_by_cursor",
+    "id_filter",
     "JsonApiGinoModel",
+    "CompiledGetGinoModel",
+    "CompiledQuery",
     "JsonApiDBModel",
     "JsonApiDataCreateBaseModel",
     "JsonApiDataUpdateBaseModel",
     "JsonApiDataDBModel",
     "JsonApiCreateBaseModel",
     "JsonApiUpdateBaseModel",
+    "TTLCache",
+    "CPUBoundExecutor",
+    "ETagRoute",
+    "UUIDBloomFilter",
+    "MetricsMiddleware",
+    "PoolMetrics",
+    "AdaptivePoolSize",
+    "PoolHooks",
+    "metrics_endpoint",
+    "QueryTiming",
+    "ServerTimingMiddleware",
+    "ReadReplicas",
+    "HMACTokenVerifier",
+    "InvalidTokenError",
+    "TokenVerifier",
+    "jwks_endpoint",
+    "token_verifier",
+    "RateLimit",
+    "TokenBuckets",
     "CREDENTIALS_EX",
     "INACTIVE_EX",
     "OAUTH2_EX",
     "NOT_IMPLEMENTED_EX",
     "NOT_AN_OWNER",
+    "CURSOR_EX",
+    "FILTER_EX",
+    "FILTER_SIZE_EX",
 ]
@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+"""Bloom filter utils."""
+
+from math import ceil, log
+from uuid import UUID
+
+
+class UUIDBloomFilter:
+    """Compact probabilistic set of random (v4) UUIDs.
+
+    UUID4 bits are already uniformly distributed, so both halves of the
+    128-bit value are used as base hashes for double hashing.
+    Negative answer is always correct, positive may be false
+    with `error_rate` probability.
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.01):
+        capacity = max(capacity, 1)
+        self.size = max(ceil(-capacity * log(error_rate) / log(2) ** 2), 8)
+        self.hash_count = max(round(self.size / capacity * log(2)), 1)
+        self.__bits = bytearray((self.size + 7) // 8)
+
+    def __positions(self, value: UUID):
+        h1 = value.int & 0xFFFFFFFFFFFFFFFF
+        h2 = value.int >> 64 | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hash_count))
+
+    def __contains__(self, value: UUID) -> bool:
+        bits = self.__bits
+        return all(bits[pos >> 3] & 1 << (pos & 7) for pos in self.__positions(value))
+
+    def add(self, value: UUID):
+        """Put value into a filter."""
+        for pos in self.__positions(value):
+            self.__bits[pos >> 3] |= 1 << (pos & 7)
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""In-process cache utils."""
+
+from collections import OrderedDict, namedtuple
+from time import monotonic
+
+CacheInfo = namedtuple("CacheInfo", ["hits", "misses", "maxsize", "currsize"])
+
+
+class TTLCache:
+    """Bounded mapping with a per-item time to live and LRU eviction.
+
+    Each worker process has its own instance, so a cached value may be
+    stale for up to `ttl` seconds unless it is invalidated explicitly.
+    `maxsize` <= 0 disables caching.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.__data = OrderedDict()
+
+    def __len__(self):
+        return len(self.__data)
+
+    def get(self, key, default=None):
+        """Get not expired value and mark it as recently used."""
+        item = self.__data.get(key)
+        if item is None:
+            self.misses += 1
+            return default
+        expires, value = item
+        if expires < monotonic():
+            del self.__data[key]
+            self.misses += 1
+            return default
+        self.__data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key, value):  # noqa: A003
+        """Store value and evict least recently used items over maxsize."""
+        if self.maxsize <= 0:
+            return
+        self.__data[key] = (monotonic() + self.ttl, value)
+        self.__data.move_to_end(key)
+        while len(self.__data) > self.maxsize:
+            self.__data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        """Invalidate key."""
+        item = self.__data.pop(key, None)
+        return default if item is None else item[1]
+
+    def clear(self):
+        """Invalidate all keys and reset counters."""
+        self.__data.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def info(self) -> CacheInfo:
+        """Hit/miss statistics like functools.lru_cache does."""
+        return CacheInfo(self.hits, self.misses, self.maxsize, len(self.__data))
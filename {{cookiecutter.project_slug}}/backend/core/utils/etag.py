@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""ETag and conditional GET requests."""
+
+from hashlib import blake2b
+from typing import Optional
+
+from fastapi.routing import APIRoute
+from starlette.requests import Request
+from starlette.responses import Response
+
+
+def body_etag(body: bytes) -> str:
+    """Strong ETag of a serialized response body."""
+    return f'"{blake2b(body, digest_size=16).hexdigest()}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match check with a weak comparison (RFC 7232)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(
+        tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(",")
+    )
+
+
+class ETagRoute(APIRoute):
+    """API route with strong ETags for successful GET responses.
+
+    Handler still runs on every request, but an unchanged body is not sent
+    again: `If-None-Match` with a current ETag gets `304 Not Modified`.
+    Responses depend on an authenticated user, so they are private for caches
+    and should be revalidated every time.
+
+    Example:
+        router = APIRouter(route_class=ETagRoute)
+    """
+
+    cache_control = "private, no-cache"
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def etag_handler(request: Request) -> Response:
+            response = await handler(request)
+            if (
+                request.method not in ("GET", "HEAD")
+                or response.status_code != 200
+                or not hasattr(response, "body")
+            ):
+                return response
+            etag = body_etag(response.body)
+            headers = {"etag": etag, "cache-control": self.cache_control}
+            if etag_matches(request.headers.get("if-none-match"), etag):
+                return Response(
+                    status_code=304, headers=headers, background=response.background
+                )
+            response.headers.update(headers)
+            return response
+
+        return etag_handler
@@ -32,3 +32,15 @@ NOT_AN_OWNER = HTTPException(
     detail="You are not an owner.",
     headers=_headers,
 )
+
+CURSOR_EX = HTTPException(
+    status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid pagination cursor."
+)
+
+FILTER_EX = HTTPException(
+    status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid filter value."
+)
+
+FILTER_SIZE_EX = HTTPException(
+    status_code=status.HTTP_400_BAD_REQUEST, detail="Too many filter values."
+)
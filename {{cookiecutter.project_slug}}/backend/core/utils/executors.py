@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+"""Executors for CPU-bound calls from async code."""
+
+import asyncio
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+
+class CPUBoundExecutor:
+    """Run blocking functions outside of the event loop.
+
+    Kind is one of:
+        thread - shared thread pool (passlib/bcrypt release the GIL);
+        process - process pool, functions and arguments must be picklable;
+        none - call function inline (blocks event loop).
+    Pool is created on a first call.
+    """
+
+    kinds = frozenset(("thread", "process", "none"))
+
+    def __init__(self, kind: str = "thread", max_workers: int = None):
+        if kind not in self.kinds:
+            raise ValueError(f"Unknown executor kind: {kind}")
+        self.kind = kind
+        self.max_workers = max_workers
+        self.__pool = None
+
+    @property
+    def pool(self):
+        if self.__pool is None and self.kind != "none":
+            if self.kind == "process":
+                self.__pool = ProcessPoolExecutor(max_workers=self.max_workers)
+            else:
+                self.__pool = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="cpu-bound"
+                )
+        return self.__pool
+
+    async def run(self, func, *args):
+        """Call func(*args) in a pool and wait for result."""
+        if self.kind == "none":
+            return func(*args)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.pool, func, *args)
+
+    def shutdown(self):
+        """Release pool workers."""
+        if self.__pool is not None:
+            self.__pool.shutdown(wait=False)
+            self.__pool = None
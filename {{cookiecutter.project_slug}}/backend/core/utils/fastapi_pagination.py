@@ -2,11 +2,24 @@
 """Fastapi-pagination extra utils."""
 from __future__ import annotations
 
-from typing import Generic, Sequence, TypeVar
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime
+from typing import Any, Generic, Optional, Sequence, TypeVar, Union
+from uuid import UUID
 
+from fastapi import Query
 from fastapi_pagination import Params
-from fastapi_pagination.bases import AbstractParams
+from fastapi_pagination.api import request, resolve_params
+from fastapi_pagination.bases import AbstractPage, AbstractParams, RawParams
 from fastapi_pagination.links import Page
+from gino.crud import CRUDModel
+from pydantic import BaseModel, conint
+from sqlalchemy import Column, DateTime, func, tuple_
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID
+from sqlalchemy.sql import Select
+
+from .exceptions import CURSOR_EX
 
 T = TypeVar("T")
 
@@ -28,3 +41,128 @@ class JsonApiPage(Page[T], Generic[T]):
 
     class Config:  # noqa: D106
         fields = {"items": {"alias": "data"}}
+
+
+def _cursor_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, UUID):
+        return str(value)
+    return value
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """Opaque url-safe cursor for a sort key values."""
+    values = [_cursor_value(value) for value in values]
+    raw = json.dumps(values, separators=(",", ":")).encode()
+    return urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor: str, keys: Sequence[Column]) -> tuple:
+    """Sort key values from a cursor, typed by a key columns."""
+    try:
+        values = json.loads(urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if not isinstance(values, list) or len(values) != len(keys):
+            raise ValueError
+        result = []
+        for key, value in zip(keys, values):
+            if isinstance(key.type, DateTime):
+                value = datetime.fromisoformat(value)
+            elif isinstance(key.type, PG_UUID):
+                value = UUID(value)
+            result.append(value)
+        return tuple(result)
+    except (ValueError, TypeError):
+        raise CURSOR_EX
+
+
+class CursorParams(BaseModel, AbstractParams):
+    """Keyset pagination params."""
+
+    cursor: Optional[str] = Query(None, description="Next page cursor")
+    size: int = Query(50, ge=1, le=100, description="Page size")
+    total: bool = Query(False, description="Count total number of items")
+
+    def to_raw_params(self) -> RawParams:
+        # one extra row tells that a next page exists
+        return RawParams(limit=self.size + 1, offset=0)
+
+
+class CursorLinks(BaseModel):
+    """JSON:API pagination links."""
+
+    self: str  # noqa: VNE003
+    next: Optional[str]  # noqa: A003
+
+
+class JsonApiCursorPage(AbstractPage[T], Generic[T]):
+    """Keyset paginated JSON:API page.
+
+    Next page is selected by a sort key of the last item, so any page
+    costs the same index range scan as a first one. Total is counted
+    only on demand.
+    """
+
+    data: Sequence[T]
+    size: conint(ge=1)  # type: ignore
+    total: Optional[conint(ge=0)]  # type: ignore
+    links: CursorLinks
+
+    __params_type__ = CursorParams
+
+    @classmethod
+    def create(
+        cls,
+        items: Sequence[T],
+        total: Optional[int],
+        params: AbstractParams,
+        next_cursor: Optional[str] = None,
+    ) -> JsonApiCursorPage[T]:
+        """Page with a `links.next` for a next_cursor."""
+        if not isinstance(params, CursorParams):
+            raise ValueError("JsonApiCursorPage should be used with CursorParams")
+
+        url = request().url
+        links = CursorLinks(
+            self=_only_path(url),
+            next=_only_path(url.include_query_params(cursor=next_cursor))
+            if next_cursor
+            else None,
+        )
+        return cls(data=items, total=total, size=params.size, links=links)
+
+
+def _only_path(url) -> str:
+    return f"{url.path}?{url.query}" if url.query else url.path
+
+
+async def paginate_by_cursor(
+    query: Union[Select, CRUDModel],
+    keys: Sequence[Column],
+    params: Optional[AbstractParams] = None,
+) -> JsonApiCursorPage:
+    """Keyset paginate gino query by an ascending unique sort key.
+
+    Keys should be covered by an index, e.g. `(created, id)`.
+    """
+    if isinstance(query, type) and issubclass(query, CRUDModel):
+        query = query.query
+
+    params = resolve_params(params)
+    if not isinstance(params, CursorParams):
+        raise ValueError("paginate_by_cursor should be used with CursorParams")
+
+    total = None
+    if params.total:
+        total = await func.count().select().select_from(query.alias()).gino.scalar()
+
+    if params.cursor:
+        query = query.where(tuple_(*keys) > tuple_(*decode_cursor(params.cursor, keys)))
+    raw_params = params.to_raw_params()
+    items = await query.order_by(*keys).limit(raw_params.limit).gino.all()
+
+    next_cursor = None
+    if len(items) > params.size:
+        items = items[: params.size]
+        next_cursor = encode_cursor([getattr(items[-1], key.name) for key in keys])
+    return JsonApiCursorPage.create(items, total, params, next_cursor=next_cursor)
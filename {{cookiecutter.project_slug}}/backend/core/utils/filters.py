@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+"""JSON:API filter query parameters."""
+
+from typing import List
+from uuid import UUID
+
+from fastapi import Query
+
+from .exceptions import FILTER_EX, FILTER_SIZE_EX
+
+
+def id_filter(max_size: int):
+    """`filter[id]` dependency: comma separated UUIDs.
+
+    Duplicates are dropped, the requested order is kept.
+
+    Example:
+        @router.get("/users")
+        async def users(ids: list = Depends(id_filter(100))):  # noqa: B008
+            ...
+    """
+
+    def ids(
+        value: str = Query(  # noqa: B008
+            ..., alias="filter[id]", description="Comma separated ids"
+        )
+    ) -> List[UUID]:
+        values = [item.strip() for item in value.split(",") if item.strip()]
+        if not values:
+            raise FILTER_EX
+        try:
+            idents = list(dict.fromkeys(UUID(item) for item in values))
+        except ValueError:
+            raise FILTER_EX
+        if len(idents) > max_size:
+            raise FILTER_SIZE_EX
+        return idents
+
+    return ids
@@ -1,14 +1,114 @@
 # -*- coding: utf-8 -*-
 """Gino models extra utils."""
 
-from inspect import iscoroutinefunction
+from operator import attrgetter
+from weakref import WeakKeyDictionary
+
+from gino.crud import DEFAULT
+from sqlalchemy import any_, bindparam
+
+
+class CompiledQuery:
+    """Gino statement compiled once per engine dialect.
+
+    SQLAlchemy compiles every executed clause again, so hot statements are
+    built once with bind parameters and only their compiled form is executed.
+    `build` is called on the first execution, when models are defined.
+    """
+
+    def __init__(self, db, build):
+        self.db = db
+        self.build = build
+        self.__query = None
+        self.__compiled = WeakKeyDictionary()
+
+    def compiled(self, bind=None):
+        dialect = (self.db.bind if bind is None else bind).dialect
+        compiled = self.__compiled.get(dialect)
+        if compiled is None:
+            if self.__query is None:
+                self.__query = self.build()
+            compiled = self.__query.compile(dialect=dialect)
+            self.__compiled[dialect] = compiled
+        return compiled
+
+    async def first(self, bind=None, **params):
+        """First row with a given bind parameters values."""
+        executor = self.db if bind is None else bind
+        return await executor.first(self.compiled(bind), **params)
+
+    async def all(self, bind=None, **params):  # noqa: A003
+        """All rows with a given bind parameters values."""
+        executor = self.db if bind is None else bind
+        return await executor.all(self.compiled(bind), **params)
+
+    async def status(self, bind=None, **params):
+        """Execute with a given bind parameters values, return status."""
+        executor = self.db if bind is None else bind
+        return await executor.status(self.compiled(bind), **params)
+
+
+class CompiledGetGinoModel:
+    """Gino db Model `get` and `get_many` by a single primary key compiled once.
+
+    Should precede db.Model in the model bases.
+    """
+
+    @classmethod
+    async def get(cls, ident, bind=None, timeout=DEFAULT):
+        if timeout is not DEFAULT or isinstance(ident, (list, tuple, dict)):
+            return await super().get(ident, bind=bind, timeout=timeout)
+        # class own __dict__ to not share a query with a parent model
+        query = cls.__dict__.get("_compiled_get")
+        if query is None:
+            (column,) = cls.__table__.primary_key.columns
+            query = CompiledQuery(
+                cls.__metadata__, lambda: cls.query.where(column == bindparam("ident"))
+            )
+            cls._compiled_get = query
+        return await query.first(bind, ident=ident)
+
+    @classmethod
+    async def get_many(cls, idents, bind=None) -> dict:
+        """Instances by primary keys with a single `= ANY(array)` query."""
+        (column,) = cls.__table__.primary_key.columns
+        query = cls.__dict__.get("_compiled_get_many")
+        if query is None:
+            query = CompiledQuery(
+                cls.__metadata__,
+                lambda: cls.query.where(column == any_(bindparam("idents"))),
+            )
+            cls._compiled_get_many = query
+        rows = await query.all(bind, idents=list(idents))
+        return {getattr(row, column.key): row for row in rows}
 
 
 class JsonApiGinoModel:
     """Gino db Model extra utilities."""
 
     __attrs_to_skip = frozenset(("attributes", "id", "data", "type"))
-    __crud_base_methods = frozenset(("update", "query", "create", "select", "delete"))
+
+    @classmethod
+    def json_api_attributes_getter(cls):
+        """Names and a getter for JSON:API `attributes` values.
+
+        Derived once per model class from the table columns metadata,
+        instead of inspecting `dir(self)` on every serialization.
+        """
+        # class own __dict__ to not share a getter with a parent model
+        serializer = cls.__dict__.get("_json_api_attributes_serializer")
+        if serializer is None:
+            names = tuple(
+                name for name in cls._column_name_map if name not in cls.__attrs_to_skip
+            )
+            if len(names) > 1:
+                getter = attrgetter(*names)
+            else:
+                # attrgetter with a single name returns a value, not a tuple
+                getter = lambda obj: tuple(getattr(obj, name) for name in names)  # noqa
+            serializer = (names, getter)
+            cls._json_api_attributes_serializer = serializer
+        return serializer
 
     @property
     def attributes(self):
@@ -17,40 +117,8 @@ class JsonApiGinoModel:
         JSON:API 1.0 specification says that we must provide
         `attributes` key with all object attributes excluding id.
         """
-        result_dict = dict()
-        for attr in dir(self):
-            # exclude `private` attr
-            if attr.startswith("_"):
-                continue
-
-            # exclude bounded GINO CRUD methods
-            if attr in self.__crud_base_methods:
-                continue
-
-            # exclude `query` attr
-            if attr.endswith("_query"):
-                continue
-
-            # exclude reserved attr
-            if attr in self.__attrs_to_skip:
-                continue
-
-            # exclude callable methods
-            if hasattr(self.__class__, attr) and callable(
-                getattr(self.__class__, attr)
-            ):  # noqa
-                continue
-
-            # get attr value
-            attr_value = getattr(self, attr)
-
-            # skip awaitable coroutines
-            if iscoroutinefunction(attr_value):
-                continue
-
-            result_dict[attr] = attr_value
-
-        return result_dict
+        names, getter = self.json_api_attributes_getter()
+        return dict(zip(names, getter(self)))
 
     @property
     def type(self):  # noqa: A003
@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+"""Asymmetric JWT signing keys and a JSON Web Key Set.
+
+Not re-exported by `core.utils`, cryptography is imported only if key pairs
+are configured.
+"""
+
+from base64 import urlsafe_b64encode
+from calendar import timegm
+from datetime import datetime
+from hashlib import sha256
+
+import orjson
+from cryptography.exceptions import InvalidSignature
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519, padding, rsa
+from cryptography.hazmat.primitives.asymmetric.utils import (
+    decode_dss_signature,
+    encode_dss_signature,
+)
+
+from .jwt import InvalidTokenError, TokenVerifier
+
+# curve name: JWS algorithm, JWK curve, hash and a coordinate size
+EC_CURVES = {
+    "secp256r1": ("ES256", "P-256", hashes.SHA256, 32),
+    "secp384r1": ("ES384", "P-384", hashes.SHA384, 48),
+    "secp521r1": ("ES512", "P-521", hashes.SHA512, 66),
+}
+# registered claims which are NumericDate, as python-jose encodes them
+DATE_CLAIMS = ("exp", "iat", "nbf")
+
+
+def b64encode(data: bytes) -> str:
+    """Unpadded base64url JWT segment."""
+    return urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def int_b64encode(value: int, size: int = None) -> str:
+    return b64encode(value.to_bytes(size or (value.bit_length() + 7) // 8, "big"))
+
+
+class SigningKey:
+    """RSA (RS256), EC (ES256, ES384, ES512) or Ed25519 (EdDSA) JWT key.
+
+    Key id is a RFC 7638 thumbprint of the public key. Public key without
+    a private one only verifies tokens, e.g. of a retired key.
+    """
+
+    def __init__(self, key):
+        if isinstance(
+            key,
+            (rsa.RSAPrivateKey, ec.EllipticCurvePrivateKey, ed25519.Ed25519PrivateKey),
+        ):
+            self.private_key, self.public_key = key, key.public_key()
+        else:
+            self.private_key, self.public_key = None, key
+        if isinstance(self.public_key, rsa.RSAPublicKey):
+            self.algorithm = "RS256"
+            numbers = self.public_key.public_numbers()
+            jwk = {
+                "kty": "RSA",
+                "e": int_b64encode(numbers.e),
+                "n": int_b64encode(numbers.n),
+            }
+        elif isinstance(self.public_key, ec.EllipticCurvePublicKey):
+            if self.public_key.curve.name not in EC_CURVES:
+                raise ValueError(f"Unsupported curve: {self.public_key.curve.name}")
+            self.algorithm, curve, self.hash, self.size = EC_CURVES[
+                self.public_key.curve.name
+            ]
+            numbers = self.public_key.public_numbers()
+            jwk = {
+                "kty": "EC",
+                "crv": curve,
+                "x": int_b64encode(numbers.x, self.size),
+                "y": int_b64encode(numbers.y, self.size),
+            }
+        elif isinstance(self.public_key, ed25519.Ed25519PublicKey):
+            self.algorithm = "EdDSA"
+            raw_key = self.public_key.public_bytes(
+                serialization.Encoding.Raw, serialization.PublicFormat.Raw
+            )
+            jwk = {"kty": "OKP", "crv": "Ed25519", "x": b64encode(raw_key)}
+        else:
+            raise ValueError(f"Unsupported key type: {type(key).__name__}")
+        # required members only, sorted and without whitespaces
+        thumbprint = sha256(orjson.dumps(jwk, option=orjson.OPT_SORT_KEYS))
+        self.kid = b64encode(thumbprint.digest())
+        self.jwk = {**jwk, "kid": self.kid, "alg": self.algorithm, "use": "sig"}
+
+    @classmethod
+    def from_pem(cls, data: bytes) -> "SigningKey":
+        """Unencrypted PEM private or public key."""
+        try:
+            key = serialization.load_pem_private_key(data, password=None)
+        except ValueError:
+            key = serialization.load_pem_public_key(data)
+        return cls(key)
+
+    def sign(self, signing_input: bytes) -> bytes:
+        if self.algorithm == "RS256":
+            return self.private_key.sign(
+                signing_input, padding.PKCS1v15(), hashes.SHA256()
+            )
+        if self.algorithm == "EdDSA":
+            return self.private_key.sign(signing_input)
+        # JWS ECDSA signature is r and s of a fixed size, not DER
+        r, s = decode_dss_signature(
+            self.private_key.sign(signing_input, ec.ECDSA(self.hash()))
+        )
+        return r.to_bytes(self.size, "big") + s.to_bytes(self.size, "big")
+
+    def verify(self, signing_input: bytes, signature: bytes) -> bool:
+        try:
+            if self.algorithm == "RS256":
+                self.public_key.verify(
+                    signature, signing_input, padding.PKCS1v15(), hashes.SHA256()
+                )
+            elif self.algorithm == "EdDSA":
+                self.public_key.verify(signature, signing_input)
+            else:
+                if len(signature) != self.size * 2:
+                    return False
+                der_signature = encode_dss_signature(
+                    int.from_bytes(signature[: self.size], "big"),
+                    int.from_bytes(signature[self.size :], "big"),  # noqa: E203
+                )
+                self.public_key.verify(
+                    der_signature, signing_input, ec.ECDSA(self.hash())
+                )
+        except InvalidSignature:
+            return False
+        return True
+
+
+class KeySet(TokenVerifier):
+    """Signing keys, the first one signs tokens and all of them verify.
+
+    To rotate keys put a new key first and keep the previous one (or its
+    public key) until tokens signed by it expire, then remove it.
+
+    Example:
+        keys = KeySet.from_files(["new.pem", "previous.pem"])
+        token = keys.encode({"id": user_id, "exp": exp})
+        claims = keys.decode(token)
+    """
+
+    def __init__(self, keys: list):
+        if not keys or keys[0].private_key is None:
+            raise ValueError("The first signing key should be a private key.")
+        super().__init__()
+        self.keys = keys
+        self.signing_key = keys[0]
+        self.algorithm = self.signing_key.algorithm
+        self.__by_kid = {key.kid: key for key in keys}
+        self.__header = b64encode(
+            orjson.dumps(
+                {"alg": self.algorithm, "kid": self.signing_key.kid, "typ": "JWT"}
+            )
+        )
+
+    @classmethod
+    def from_files(cls, paths: list) -> "KeySet":
+        keys = []
+        for path in paths:
+            with open(path, "rb") as key_file:
+                keys.append(SigningKey.from_pem(key_file.read()))
+        return cls(keys)
+
+    def jwks(self) -> dict:
+        """Public keys as a JSON Web Key Set."""
+        return {"keys": [key.jwk for key in self.keys]}
+
+    def encode(self, claims: dict) -> str:
+        """Token signed by the first key."""
+        claims = {
+            name: timegm(value.utctimetuple())
+            if name in DATE_CLAIMS and isinstance(value, datetime)
+            else value
+            for name, value in claims.items()
+        }
+        signing_input = f"{self.__header}.{b64encode(orjson.dumps(claims))}"
+        signature = self.signing_key.sign(signing_input.encode("ascii"))
+        return f"{signing_input}.{b64encode(signature)}"
+
+    def header_key(self, header: dict) -> SigningKey:
+        key = self.__by_kid.get(header.get("kid"))
+        if key is None:
+            raise InvalidTokenError("Unknown token key id.")
+        if header.get("alg") != key.algorithm:
+            raise InvalidTokenError("Unexpected token algorithm.")
+        return key
+
+    def verify_signature(self, key, signing_input: bytes, signature: bytes) -> bool:
+        return key.verify(signing_input, signature)
@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+"""JWT signature and expiration verification."""
+
+import hmac
+from abc import ABC, abstractmethod
+from base64 import urlsafe_b64decode
+from hashlib import sha256, sha384, sha512
+from time import time
+
+import orjson
+from starlette.requests import Request
+from starlette.responses import Response
+
+from .etag import body_etag, etag_matches
+
+HMAC_DIGESTS = {"HS256": sha256, "HS384": sha384, "HS512": sha512}
+
+
+class InvalidTokenError(ValueError):
+    """Malformed, badly signed or expired token."""
+
+
+def b64decode(segment: str) -> bytes:
+    """Unpadded base64url JWT segment."""
+    return urlsafe_b64decode(segment + "=" * (-len(segment) % 4))
+
+
+class TokenVerifier(ABC):
+    """JWT verification in a single pass.
+
+    Header selects the verification key and is parsed only once, headers
+    are cached after a successful signature check (tokens of a single
+    issuer share a few of them). Claims are parsed only for a valid
+    signature and only `exp` claim is checked.
+    """
+
+    max_headers = 16
+
+    def __init__(self):
+        self.__header_keys = {}
+
+    @abstractmethod
+    def header_key(self, header: dict):
+        """Verification key for a parsed token header."""
+
+    @abstractmethod
+    def verify_signature(self, key, signing_input: bytes, signature: bytes) -> bool:
+        """Token signature check with a key of the header."""
+
+    def decode(self, token: str, now: float = None) -> dict:
+        """Verified token claims."""
+        try:
+            signing_input, _, signature = token.rpartition(".")
+            header, _, payload = signing_input.partition(".")
+            key = self.__header_keys.get(header)
+            cached = key is not None
+            if not cached:
+                header_data = orjson.loads(b64decode(header))
+                if not isinstance(header_data, dict):
+                    raise InvalidTokenError("Header is not an object.")
+                key = self.header_key(header_data)
+            if not self.verify_signature(
+                key, signing_input.encode("ascii"), b64decode(signature)
+            ):
+                raise InvalidTokenError("Signature verification failed.")
+            if not cached and len(self.__header_keys) < self.max_headers:
+                self.__header_keys[header] = key
+            claims = orjson.loads(b64decode(payload))
+        except (ValueError, TypeError, AttributeError) as exc:
+            # InvalidTokenError is a ValueError as well
+            raise InvalidTokenError(str(exc)) from exc
+        if not isinstance(claims, dict):
+            raise InvalidTokenError("Claims are not an object.")
+        check_exp(claims, now)
+        return claims
+
+
+class HMACTokenVerifier(TokenVerifier):
+    """HS256, HS384 or HS512 JWT verification.
+
+    Key is hashed into an HMAC object once and every token copies it.
+
+    Example:
+        verifier = HMACTokenVerifier(SECRET_KEY, "HS256")
+        user_id = verifier.decode(token)["id"]
+    """
+
+    def __init__(self, key: str, algorithm: str):
+        if algorithm not in HMAC_DIGESTS:
+            raise ValueError(f"Not an HMAC algorithm: {algorithm}")
+        if not key:
+            raise ValueError("Token signing key is not configured.")
+        super().__init__()
+        self.algorithm = algorithm
+        self.__mac = hmac.new(key.encode(), digestmod=HMAC_DIGESTS[algorithm])
+
+    def signature(self, signing_input: bytes) -> bytes:
+        mac = self.__mac.copy()
+        mac.update(signing_input)
+        return mac.digest()
+
+    def header_key(self, header: dict):
+        if header.get("alg") != self.algorithm:
+            raise InvalidTokenError("Unexpected token algorithm.")
+        return self.algorithm
+
+    def verify_signature(self, key, signing_input: bytes, signature: bytes) -> bool:
+        return hmac.compare_digest(self.signature(signing_input), signature)
+
+
+class JoseTokenVerifier:
+    """python-jose verification for other algorithms, imported on the first use."""
+
+    def __init__(self, key: str, algorithm: str):
+        self.key = key
+        self.algorithm = algorithm
+
+    def decode(self, token: str, now: float = None) -> dict:
+        """Verified token claims."""
+        from jose import JWTError, jwt
+
+        try:
+            claims = jwt.decode(
+                token,
+                self.key,
+                algorithms=[self.algorithm],
+                options={"verify_exp": False},
+            )
+        except JWTError as exc:
+            raise InvalidTokenError(str(exc)) from exc
+        check_exp(claims, now)
+        return claims
+
+
+def check_exp(claims: dict, now: float = None):
+    """Token without `exp` or with `exp` in the past is rejected."""
+    exp = claims.get("exp")
+    if isinstance(exp, bool) or not isinstance(exp, (int, float)):
+        raise InvalidTokenError("Token has no expiration time.")
+    if exp <= (time() if now is None else now):
+        raise InvalidTokenError("Signature has expired.")
+
+
+def token_verifier(key: str, algorithm: str):
+    """Fast verifier for HMAC algorithms, python-jose for the rest."""
+    if algorithm in HMAC_DIGESTS:
+        return HMACTokenVerifier(key, algorithm)
+    return JoseTokenVerifier(key, algorithm)
+
+
+def jwks_endpoint(jwks: dict, max_age: int):
+    """JSON Web Key Set endpoint, public keys are cacheable by anyone."""
+    body = orjson.dumps(jwks)
+    headers = {"etag": body_etag(body), "cache-control": f"public, max-age={max_age}"}
+
+    async def jwks_json(request: Request) -> Response:
+        if etag_matches(request.headers.get("if-none-match"), headers["etag"]):
+            return Response(status_code=304, headers=headers)
+        return Response(body, media_type="application/json", headers=headers)
+
+    return jwks_json
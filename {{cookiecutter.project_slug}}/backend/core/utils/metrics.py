@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+"""Prometheus metrics.
+
+If `PROMETHEUS_MULTIPROC_DIR` environment variable is set, every worker
+process writes its values to that directory and `/metrics` aggregates
+all of them, so it doesn't matter which worker serves a scrape.
+The directory should be emptied before the server start.
+"""
+
+import asyncio
+import os
+from time import perf_counter
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.routing import Mount
+
+from .pool_hooks import PoolHooks
+
+UNMATCHED_ROUTE = "<unmatched>"
+
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request duration by route and status.",
+    ["method", "route", "status"],
+)
+REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress",
+    "HTTP requests in progress.",
+    ["method"],
+    multiprocess_mode="livesum",
+)
+DB_POOL_SIZE = Gauge(
+    "db_pool_size", "Opened database connections.", multiprocess_mode="livesum"
+)
+DB_POOL_IDLE = Gauge(
+    "db_pool_idle_connections",
+    "Free database connections.",
+    multiprocess_mode="livesum",
+)
+DB_POOL_MAX_SIZE = Gauge(
+    "db_pool_max_size", "Database pool size limit.", multiprocess_mode="livesum"
+)
+DB_POOL_FLOOR = Gauge(
+    "db_pool_min_size",
+    "Adaptive database pool connections floor.",
+    multiprocess_mode="livesum",
+)
+DB_POOL_RESIZES = Counter(
+    "db_pool_resizes", "Adaptive database pool floor changes.", ["direction"]
+)
+DB_POOL_ACQUIRE = Histogram(
+    "db_pool_acquire_seconds",
+    "Time spent waiting for a database connection.",
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+
+
+def route_paths(routes, paths: dict = None) -> dict:
+    """Endpoint to route path template for all routes including mounted."""
+    paths = {} if paths is None else paths
+    for route in routes:
+        if isinstance(route, Mount):
+            route_paths(route.routes, paths)
+        elif hasattr(route, "endpoint"):
+            paths.setdefault(route.endpoint, route.path)
+    return paths
+
+
+class MetricsMiddleware:
+    """Latency histogram by route template and status, in-flight requests.
+
+    Route templates are used as labels instead of raw paths to keep
+    metrics cardinality bounded.
+    """
+
+    def __init__(self, app, routes):
+        self.app = app
+        self.routes = routes
+        self.__paths = None
+
+    def route(self, scope) -> str:
+        if self.__paths is None:
+            self.__paths = route_paths(self.routes)
+        path = self.__paths.get(scope.get("endpoint"))
+        if path is None:
+            return UNMATCHED_ROUTE
+        # mounted apps, such as api versions, extend root_path
+        return scope.get("root_path", "") + path
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        method = scope["method"]
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        in_progress = REQUESTS_IN_PROGRESS.labels(method)
+        in_progress.inc()
+        started = perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            REQUEST_DURATION.labels(method, self.route(scope), status).observe(
+                perf_counter() - started
+            )
+            in_progress.dec()
+
+
+class PoolMetrics:
+    """Gino engine pool gauges and acquire wait histogram.
+
+    Pool is sampled periodically, so every worker keeps its values fresh
+    for a multiprocess scrape.
+    """
+
+    def __init__(self, db, interval: float):
+        self.db = db
+        self.interval = interval
+        self.__task = None
+
+    def sample(self):
+        """Set pool gauges from the current pool state."""
+        engine = self.db.bind
+        if engine is None:
+            return
+        pool = engine.raw_pool
+        DB_POOL_SIZE.set(pool.get_size())
+        DB_POOL_IDLE.set(pool.get_idle_size())
+        DB_POOL_MAX_SIZE.set(pool.get_max_size())
+
+    @staticmethod
+    def observe_acquire(wait: float, acquired: bool):
+        DB_POOL_ACQUIRE.observe(wait)
+
+    def instrument(self):
+        """Measure connection acquire time of a bound engine pool."""
+        PoolHooks.of(self.db).add(on_acquire=self.observe_acquire)
+
+    async def _run(self):
+        while True:
+            self.sample()
+            await asyncio.sleep(self.interval)
+
+    async def start(self):
+        self.instrument()
+        self.__task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self.__task is not None:
+            self.__task.cancel()
+            self.__task = None
+        if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+            multiprocess.mark_process_dead(os.getpid())
+
+
+def metrics_registry():
+    """Registry that collects values of all worker processes if needed."""
+    if "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+def metrics_endpoint(pool_metrics: PoolMetrics):
+    """Prometheus text format endpoint."""
+
+    async def metrics(request: Request) -> Response:
+        pool_metrics.sample()
+        return Response(
+            generate_latest(metrics_registry()), media_type=CONTENT_TYPE_LATEST
+        )
+
+    return metrics
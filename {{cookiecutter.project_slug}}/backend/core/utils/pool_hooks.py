@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""Database pool acquire and release hooks."""
+
+from time import perf_counter
+from weakref import WeakKeyDictionary
+
+_pool_hooks = WeakKeyDictionary()
+
+
+class PoolHooks:
+    """Acquire and release callbacks of a bound Gino engine pool.
+
+    Pool `acquire` and `release` are wrapped once per pool, however many
+    features (metrics, adaptive pool size) observe it. Acquire callbacks get
+    the wait in seconds and whether a connection was acquired, they are called
+    for timed out acquires as well.
+
+    Example:
+        PoolHooks.of(db).add(on_acquire=lambda wait, acquired: ...)
+    """
+
+    def __init__(self, pool):
+        self.acquire_callbacks = []
+        self.release_callbacks = []
+        acquire, release = pool.acquire, pool.release
+
+        async def observed_acquire(*, timeout=None):
+            started = perf_counter()
+            acquired = False
+            try:
+                conn = await acquire(timeout=timeout)
+                acquired = True
+                return conn
+            finally:
+                wait = perf_counter() - started
+                for callback in self.acquire_callbacks:
+                    callback(wait, acquired)
+
+        async def observed_release(conn):
+            for callback in self.release_callbacks:
+                callback()
+            await release(conn)
+
+        pool.acquire, pool.release = observed_acquire, observed_release
+
+    @classmethod
+    def of(cls, db) -> "PoolHooks":
+        """Hooks of the db bound engine pool, the pool is wrapped on the first call."""
+        pool = db.bind._pool
+        hooks = _pool_hooks.get(pool)
+        if hooks is None:
+            hooks = _pool_hooks[pool] = cls(pool)
+        return hooks
+
+    def add(self, on_acquire=None, on_release=None):
+        """Register callbacks, registered ones are not added twice."""
+        if on_acquire is not None and on_acquire not in self.acquire_callbacks:
+            self.acquire_callbacks.append(on_acquire)
+        if on_release is not None and on_release not in self.release_callbacks:
+            self.release_callbacks.append(on_release)
@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+"""Adaptive database pool size.
+
+asyncpg keeps at least `min_size` connections open and reconnects them in
+the background, connections above it are opened on demand on the request
+path. The floor is fixed at the pool creation, so it is moved through the
+pool attribute (as gino itself reads it) between the configured bounds.
+These asyncpg internals are checked at startup, adaptive sizing is off
+without them.
+"""
+
+import asyncio
+import logging
+
+from .metrics import DB_POOL_FLOOR, DB_POOL_RESIZES
+from .pool_hooks import PoolHooks
+
+POOL_INTERNALS = ("_minsize", "_schedule_min_size_maintenance", "_holders")
+HOLDER_INTERNALS = ("is_connected", "is_idle", "terminate")
+
+logger = logging.getLogger(__name__)
+
+
+class AdaptivePoolSize:
+    """Grow the pool floor on slow acquires, shrink it when it is unused.
+
+    Every `interval` seconds the mean acquire wait is checked: waiting longer
+    than `grow_wait` means connections are opened on the request path (or the
+    pool is exhausted), so the floor is doubled. If no more than half of the
+    floor was in use, it is halved and idle connections above it are closed.
+    """
+
+    def __init__(
+        self, db, min_size: int, max_size: int, interval: float, grow_wait: float
+    ):
+        self.db = db
+        self.min_size = min_size
+        self.max_size = max_size
+        self.interval = interval
+        self.grow_wait = grow_wait
+        self.__task = None
+        self.__in_use = 0
+        self.reset()
+
+    def reset(self):
+        """Start a new observation window."""
+        self.acquires = 0
+        self.wait = 0.0
+        self.peak = self.__in_use
+
+    @property
+    def raw_pool(self):
+        return self.db.bind.raw_pool
+
+    @property
+    def floor(self) -> int:
+        return self.raw_pool.get_min_size()
+
+    @property
+    def supported(self) -> bool:
+        """Whether the bound asyncpg pool has the internals the floor is moved by."""
+        pool = self.raw_pool
+        return all(hasattr(pool, name) for name in POOL_INTERNALS) and all(
+            hasattr(holder, name)
+            for holder in pool._holders
+            for name in HOLDER_INTERNALS
+        )
+
+    def observe_acquire(self, wait: float, acquired: bool):
+        if acquired:
+            self.acquires += 1
+            self.wait += wait
+            self.__in_use += 1
+            self.peak = max(self.peak, self.__in_use)
+
+    def observe_release(self):
+        self.__in_use -= 1
+
+    def instrument(self):
+        """Measure acquire wait and connections in use of a bound engine pool."""
+        PoolHooks.of(self.db).add(
+            on_acquire=self.observe_acquire, on_release=self.observe_release
+        )
+
+    def set_floor(self, size: int, reason: str):
+        pool = self.raw_pool
+        direction = "grow" if size > self.floor else "shrink"
+        logger.info(
+            "Database pool floor %d -> %d (%s), %d of %d connections in use",
+            self.floor,
+            size,
+            reason,
+            self.peak,
+            pool.get_size(),
+        )
+        pool._minsize = size
+        if direction == "grow":
+            # connects missing floor connections in the background
+            pool._schedule_min_size_maintenance()
+        else:
+            for holder in pool._holders:
+                if pool.get_size() <= size:
+                    break
+                if holder.is_connected() and holder.is_idle():
+                    holder.terminate()
+        DB_POOL_FLOOR.set(size)
+        DB_POOL_RESIZES.labels(direction).inc()
+
+    def resize(self):
+        """Move the floor by the last window stats."""
+        floor = self.floor
+        mean_wait = self.wait / self.acquires if self.acquires else 0.0
+        if mean_wait > self.grow_wait and floor < self.max_size:
+            self.set_floor(
+                min(self.max_size, max(floor * 2, self.peak)),
+                f"mean acquire wait {mean_wait * 1000:.1f}ms",
+            )
+        elif floor > self.min_size and self.peak <= floor // 2:
+            self.set_floor(max(self.min_size, floor // 2), "unused connections")
+        self.reset()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            self.resize()
+
+    async def start(self):
+        if not self.supported:
+            logger.warning(
+                "Adaptive database pool size is off: the asyncpg pool internals "
+                "it needs are missing, asyncpg version is not supported"
+            )
+            return
+        self.instrument()
+        DB_POOL_FLOOR.set(self.floor)
+        self.__task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self.__task is not None:
+            self.__task.cancel()
+            self.__task = None
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""Per-request database queries timing.
+
+Gino executes statements through its own asyncpg cursor, bypassing
+SQLAlchemy cursor events and asyncpg query loggers, so the engine cursor
+class is extended instead.
+"""
+
+import logging
+from contextvars import ContextVar
+from time import perf_counter
+from typing import Optional
+
+slow_query_logger = logging.getLogger("core.db.slow_query")
+
+
+class QueryStats:
+    """Number of queries and their total duration in seconds."""
+
+    __slots__ = ("count", "duration")
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+
+query_stats: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+
+def record_query(query: str, args, elapsed: float, slow_threshold: float):
+    """Add query to the current request stats and log it if it is slow."""
+    stats = query_stats.get()
+    if stats is not None:
+        stats.count += 1
+        stats.duration += elapsed
+    if slow_threshold and elapsed >= slow_threshold:
+        # parameters may hold tokens and personal data, only count is logged
+        slow_query_logger.warning(
+            "Slow query %.1fms, %d redacted params: %s",
+            elapsed * 1000,
+            len(args or ()),
+            " ".join(str(query).split()),
+        )
+
+
+def timed_cursor_cls(cursor_cls, slow_threshold: float):
+    """Gino DBAPI cursor class that records every executed statement.
+
+    Duration includes lazy connection acquisition of the statement.
+    """
+
+    class TimedCursor(cursor_cls):
+        async def prepare(self, context, clause=None):
+            started = perf_counter()
+            try:
+                return await super().prepare(context, clause)
+            finally:
+                record_query(
+                    context.statement, (), perf_counter() - started, slow_threshold
+                )
+
+        async def async_execute(self, query, timeout, args, limit=0, many=False):
+            started = perf_counter()
+            try:
+                return await super().async_execute(query, timeout, args, limit, many)
+            finally:
+                record_query(query, args, perf_counter() - started, slow_threshold)
+
+    return TimedCursor
+
+
+class QueryTiming:
+    """Instrument a bound gino engine and read replicas engines on startup.
+
+    Statements longer than slow_threshold seconds are logged, 0 disables it.
+    """
+
+    def __init__(self, db, slow_threshold: float, replicas=None):
+        self.db = db
+        self.slow_threshold = slow_threshold
+        self.replicas = replicas
+
+    def instrument(self):
+        engines = [self.db.bind]
+        if self.replicas is not None:
+            engines.extend(self.replicas.engines)
+        for engine in engines:
+            dialect = engine._dialect
+            # instance attribute, other engines are not affected
+            dialect.cursor_cls = timed_cursor_cls(
+                type(dialect).cursor_cls, self.slow_threshold
+            )
+
+
+class ServerTimingMiddleware:
+    """Collect per-request queries and report them in a Server-Timing header.
+
+    `db` is time spent in queries, `app` is the rest of the time
+    before the response start.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = QueryStats()
+        token = query_stats.set(stats)
+        started = perf_counter()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                total = perf_counter() - started
+                timing = (
+                    f'db;dur={stats.duration * 1000:.1f};desc="{stats.count} queries", '
+                    f"app;dur={(total - stats.duration) * 1000:.1f}"
+                )
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"server-timing", timing.encode("latin-1"))
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            query_stats.reset(token)
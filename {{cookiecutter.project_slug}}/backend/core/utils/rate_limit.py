@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""In-memory token bucket rate limits."""
+
+from math import ceil
+from time import monotonic
+
+from fastapi import HTTPException, status
+
+
+class TokenBuckets:
+    """Token bucket by key: `burst` requests at once, refilled `rate` per second.
+
+    Each worker process has its own buckets. Event loop checks one request
+    at a time, so buckets need no locks. Bucket idle long enough to refill
+    is the same as a missing one, such buckets are evicted from one shard at
+    a time, so every shard is swept once per refill time and a sweep never
+    walks all the buckets at once.
+    """
+
+    def __init__(self, rate: float, burst: int, shards: int = 16):
+        if rate <= 0 or burst < 1:
+            raise ValueError(f"Invalid token bucket rate {rate} or burst {burst}.")
+        self.rate = rate
+        self.burst = burst
+        self.refill_time = burst / rate
+        self.__shards = [{} for _ in range(shards)]
+        self.__next_shard = 0
+        self.__sweep_at = 0.0
+
+    def __len__(self):
+        return sum(len(shard) for shard in self.__shards)
+
+    def take(self, key, now: float = None) -> float:
+        """Take a token, returns 0 or seconds to wait for the next token."""
+        now = monotonic() if now is None else now
+        shard = self.__shards[hash(key) % len(self.__shards)]
+        bucket = shard.get(key)
+        if bucket is None:
+            tokens = self.burst
+        else:
+            tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+        if tokens < 1:
+            return (1 - tokens) / self.rate
+        shard[key] = (tokens - 1, now)
+        if now >= self.__sweep_at:
+            self.sweep(now)
+        return 0.0
+
+    def sweep(self, now: float):
+        """Evict refilled buckets of the next shard."""
+        shard = self.__shards[self.__next_shard]
+        idle = [
+            key
+            for key, (_, updated) in shard.items()
+            if now - updated >= self.refill_time
+        ]
+        for key in idle:
+            del shard[key]
+        self.__next_shard = (self.__next_shard + 1) % len(self.__shards)
+        self.__sweep_at = now + self.refill_time / len(self.__shards)
+
+    def clear(self):
+        for shard in self.__shards:
+            shard.clear()
+
+
+class RateLimit:
+    """Token buckets that reject requests over the limit with `429`.
+
+    Zero rate disables the limit, buckets are not created then.
+    """
+
+    def __init__(self, rate: float, burst: int, enabled: bool = True):
+        self.enabled = enabled and rate != 0
+        self.buckets = TokenBuckets(rate=rate, burst=burst) if self.enabled else None
+
+    def check(self, key):
+        """Raise 429 with Retry-After if the key is over the limit."""
+        if not self.enabled:
+            return
+        wait = self.buckets.take(key)
+        if wait:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many requests.",
+                headers={"Retry-After": str(ceil(wait))},
+            )
+
+    def clear(self):
+        if self.buckets is not None:
+            self.buckets.clear()
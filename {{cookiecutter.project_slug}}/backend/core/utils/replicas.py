@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+"""Read replicas routing.
+
+Read-only lookups are sent to a replica engine, everything else keeps
+using the primary `db` bind. Replicas lag behind the primary, so reads
+of a key (e.g. user id) that was written by this worker recently and
+reads following a write in the same request go to the primary.
+"""
+
+import asyncio
+import logging
+from contextvars import ContextVar
+from itertools import count
+from time import monotonic
+
+from asyncpg import InterfaceError, PostgresConnectionError
+from gino import create_engine
+
+from .cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+BALANCE_STRATEGIES = ("round_robin", "least_loaded")
+# errors after which a replica is considered unavailable
+REPLICA_ERRORS = (
+    OSError,
+    asyncio.TimeoutError,
+    InterfaceError,
+    PostgresConnectionError,
+)
+
+wrote_to_primary: ContextVar[bool] = ContextVar("wrote_to_primary", default=False)
+
+
+class ReadReplicas:
+    """Replica engines with round-robin or least-loaded selection.
+
+    `least_loaded` picks an engine with the fewest connections in use.
+    Unavailable replica is skipped for `retry_interval` seconds, reads fall
+    back to the primary if there is no available replica.
+    """
+
+    def __init__(
+        self,
+        dsns: list,
+        balance: str,
+        sticky_seconds: float,
+        retry_interval: float,
+        sticky_max_size: int = 10000,
+        **engine_options,
+    ):
+        if balance not in BALANCE_STRATEGIES:
+            raise ValueError(f"Unknown replicas balance strategy: {balance}")
+        self.dsns = list(dsns)
+        self.balance = balance
+        self.retry_interval = retry_interval
+        self.engine_options = engine_options
+        self.engines = []
+        self.__written = TTLCache(maxsize=sticky_max_size, ttl=sticky_seconds)
+        self.__unavailable = {}
+        self.__counter = count()
+
+    async def start(self):
+        """Create replica engines, unavailable replicas are skipped."""
+        for dsn in self.dsns:
+            try:
+                engine = await create_engine(dsn, **self.engine_options)
+            except REPLICA_ERRORS as exc:
+                logger.warning("Read replica is unavailable on startup: %r", exc)
+                continue
+            self.engines.append(engine)
+
+    async def stop(self):
+        engines, self.engines = self.engines, []
+        for engine in engines:
+            await engine.close()
+
+    def mark_written(self, key=None):
+        """Route next reads of the key and of the current request to primary."""
+        wrote_to_primary.set(True)
+        if key is not None:
+            self.__written.set(key, True)
+
+    def mark_unavailable(self, engine):
+        self.__unavailable[engine] = monotonic() + self.retry_interval
+
+    def available(self) -> list:
+        now = monotonic()
+        return [
+            engine
+            for engine in self.engines
+            if self.__unavailable.get(engine, 0) <= now
+        ]
+
+    def engine(self, key=None):
+        """Replica engine for a read of the key or None for the primary."""
+        if wrote_to_primary.get() or (
+            key is not None and self.__written.get(key) is not None
+        ):
+            return None
+        engines = self.available()
+        if not engines:
+            return None
+        if self.balance == "least_loaded":
+            return min(engines, key=self.in_use)
+        return engines[next(self.__counter) % len(engines)]
+
+    @staticmethod
+    def in_use(engine) -> int:
+        pool = engine.raw_pool
+        return pool.get_size() - pool.get_idle_size()
+
+    async def get(self, model, ident):
+        """Model instance by primary key, preferably from a replica.
+
+        Primary is queried if there is no suitable replica, the replica
+        fails or the row is not replicated yet.
+        """
+        engine = self.engine(ident)
+        if engine is not None:
+            try:
+                instance = await model.get(ident, bind=engine)
+            except REPLICA_ERRORS as exc:
+                logger.warning("Read replica query failed: %r", exc)
+                self.mark_unavailable(engine)
+            else:
+                if instance is not None:
+                    return instance
+        return await model.get(ident)
+
+    async def get_many(self, model, idents: list) -> dict:
+        """Model instances by primary keys, preferably from a replica.
+
+        Primary is queried for all keys if any of them was written recently
+        and for keys which a replica failed to return.
+        """
+        instances = {}
+        engine = None
+        if not any(self.__written.get(ident) is not None for ident in idents):
+            engine = self.engine()
+        if engine is not None:
+            try:
+                instances = await model.get_many(idents, bind=engine)
+            except REPLICA_ERRORS as exc:
+                logger.warning("Read replica query failed: %r", exc)
+                self.mark_unavailable(engine)
+        missing = [ident for ident in idents if ident not in instances]
+        if missing:
+            instances.update(await model.get_many(missing))
+        return instances
@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+"""Project response classes."""
+
+from typing import Any
+
+import orjson
+from fastapi.responses import JSONResponse
+
+
+class JsonApiResponse(JSONResponse):
+    """JSON:API response rendered by orjson.
+
+    UUID, datetime and dataclasses are serialized natively,
+    without a stdlib json round trip.
+    """
+
+    media_type = "application/vnd.api+json"
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+RESPONSE_CLASSES = {"json": JSONResponse, "json_api": JsonApiResponse}
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""Bulk users import and sync by ext_id.
+
+Users are read from a CSV file with a header row or from NDJSON (an object
+per line) with `ext_id`, `username` and optional `given_name`, `family_name`
+and `full_name` fields. New users are created, existing ones get the file
+profile, disabled users are not changed:
+
+    python import_users.py users.csv
+    python import_users.py --format ndjson - < users.ndjson
+
+Rows are streamed into the database with COPY and merged by a single
+statement in one transaction: memory use doesn't depend on the file size,
+an invalid row rolls back the whole import. Database is configured by the
+usual DB_* environment variables.
+"""
+
+import argparse
+import asyncio
+import csv
+import sys
+from pathlib import Path
+
+import orjson
+from asyncpg import PostgresError
+
+from core.config import DB_DSN, DB_SSL
+from core.database import UserGinoModel, db
+
+FORMATS = {".csv": "csv", ".ndjson": "ndjson", ".jsonl": "ndjson"}
+REQUIRED_FIELDS = ("ext_id", "username")
+OPTIONAL_FIELDS = ("given_name", "family_name", "full_name")
+
+
+def profile(data, line: int) -> dict:
+    """Validated profile fields, empty optional fields are nulls."""
+    if not isinstance(data, dict):
+        raise ValueError(f"line {line}: not an object")
+    result = {}
+    for field in (*REQUIRED_FIELDS, *OPTIONAL_FIELDS):
+        value = data.get(field) or None
+        if value is None and field in REQUIRED_FIELDS:
+            raise ValueError(f"line {line}: {field} is required")
+        if value is not None and not isinstance(value, str):
+            raise ValueError(f"line {line}: {field} is not a string")
+        result[field] = value
+    return result
+
+
+def read_csv(lines):
+    """Profiles of CSV lines, the first one is a header."""
+    reader = csv.DictReader(lines)
+    for row in reader:
+        yield profile(row, reader.line_num)
+
+
+def read_ndjson(lines):
+    """Profiles of NDJSON lines, blank lines are skipped."""
+    for line, text in enumerate(lines, 1):
+        if text.strip():
+            try:
+                data = orjson.loads(text)
+            except orjson.JSONDecodeError as exc:
+                raise ValueError(f"line {line}: {exc}") from exc
+            yield profile(data, line)
+
+
+READERS = {"csv": read_csv, "ndjson": read_ndjson}
+
+
+async def run(profiles):
+    await db.set_bind(DB_DSN, min_size=1, max_size=1, ssl=DB_SSL)
+    try:
+        return await UserGinoModel.import_profiles(profiles)
+    finally:
+        await db.pop_bind().close()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n", 1)[0])
+    parser.add_argument("path", help="CSV or NDJSON file, - for stdin")
+    parser.add_argument(
+        "--format", choices=sorted(READERS), help="by default by the file extension"
+    )
+    args = parser.parse_args(argv)
+    if args.format is None:
+        args.format = FORMATS.get(Path(args.path).suffix.lower())
+        if args.format is None:
+            parser.error("unknown file format, use --format")
+    return args
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    if args.path == "-":
+        lines = sys.stdin
+    else:
+        lines = open(args.path, newline="", encoding="utf-8")
+    try:
+        with lines:
+            result = asyncio.run(run(READERS[args.format](lines)))
+    except (ValueError, PostgresError) as exc:
+        sys.stderr.write(f"{args.path}: {exc}\n")
+        return 1
+    sys.stdout.write(
+        f"rows: {result.rows}, created: {result.inserted}, "
+        f"updated: {result.updated}\n"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""Production multi-worker application runner.
+
+Gunicorn master supervises uvicorn workers:
+    HUP - start new workers and gracefully stop the old ones;
+    TTIN/TTOU - add/remove a worker;
+    TERM - graceful shutdown, QUIT/INT - fast shutdown;
+    USR2 then WINCH and QUIT for the old master - zero downtime code upgrade.
+App is imported in the master before fork, so workers share its memory
+pages copy-on-write. Because of that HUP doesn't reload the code.
+"""
+
+import os
+
+from gunicorn.app.base import BaseApplication
+from uvicorn.workers import UvicornWorker
+
+from core import config
+
+
+class Worker(UvicornWorker):
+    """Uvicorn worker with the project settings."""
+
+    CONFIG_KWARGS = {
+        "loop": "uvloop",
+        "http": config.API_HTTP,
+        "limit_concurrency": config.API_LIMIT_CONCURRENCY,
+    }
+
+
+def child_exit(server, worker):
+    """Drop live metrics of a dead worker."""
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
+
+
+class Application(BaseApplication):
+    """Gunicorn application with the preloaded api:app."""
+
+    def __init__(self, options: dict):
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        from api import app
+
+        return app
+
+
+def options() -> dict:
+    return {
+        "bind": f"{config.API_HOST}:{config.API_PORT}",
+        "workers": config.API_WORKERS,
+        "worker_class": Worker,
+        "preload_app": True,
+        "keepalive": config.API_KEEPALIVE,
+        "backlog": config.API_BACKLOG,
+        "graceful_timeout": config.API_GRACEFUL_TIMEOUT,
+        "max_requests": config.API_MAX_REQUESTS,
+        "max_requests_jitter": config.API_MAX_REQUESTS_JITTER,
+        "child_exit": child_exit,
+    }
+
+
+if __name__ == "__main__":
+    Application(options()).run()
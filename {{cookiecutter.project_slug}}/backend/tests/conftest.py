@@ -5,6 +5,7 @@ import pytest
 from async_asgi_testclient import TestClient
 
 from core.database import UserGinoModel
+from core.services.security import ip_rate_limit, user_rate_limit
 
 from ..api import app
 
@@ -28,6 +29,8 @@ async def backend_app(alembic_runner):
 
     # clear all data in database by downgrade alembic migrations.
     alembic_runner.migrate_down_to("base")
+    ip_rate_limit.clear()
+    user_rate_limit.clear()
 
 
 def pytest_sessionfinish(session, exitstatus):
@@ -1,23 +1,46 @@
 # -*- coding: utf-8 -*-
 """Core auth tests."""
+import json
 import os
 from datetime import datetime, timedelta
 from random import randint
 
 import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ed25519, rsa
 from fastapi import HTTPException, status
+from google.auth import crypt
+from google.auth import jwt as google_jwt
 from jose import jwt
 from pydantic import ValidationError
 
-from core.config import ACCESS_TOKEN_EXPIRE_MIN, ALGORITHM, GOOGLE_CLIENT_ID
+from core.config import (
+    ACCESS_TOKEN_EXPIRE_MIN,
+    ALGORITHM,
+    GOOGLE_CLIENT_ID,
+    SECRET_KEY,
+    SWAP_TOKEN_ENDPOINT,
+)
 from core.database import TokenInfoGinoModel, UserGinoModel
+from core.database.models.security import auth as models_auth
+from core.database.models.security.auth import user_cache
 from core.schemas import GoogleIdInfo
+from core.schemas.security import oauth2 as schemas_oauth2
+from core.services.security import auth as services_auth
 from core.services.security import (
     get_current_user,
     get_or_create_user,
     get_user_for_refresh,
+    ip_rate_limit,
+    revoked_users,
+    user_rate_limit,
 )
-from core.utils.exceptions import CREDENTIALS_EX, INACTIVE_EX
+from core.services.security.oauth2 import GoogleClientConfig, GoogleOAuth2Client
+from core.utils import TokenBuckets
+from core.utils.exceptions import CREDENTIALS_EX, INACTIVE_EX, OAUTH2_EX
+from core.utils.jwk import KeySet, SigningKey
+
+from ..api.v1.handlers import security as security_handlers
 
 pytestmark = [
     pytest.mark.asyncio,
@@ -150,6 +173,17 @@ class TestGoogleIdInfoPydantic:
         assert isinstance(serializer, GoogleIdInfo)
         assert serializer.username != "user"
 
+    def test_expired(self):
+        # expiration is checked against the current time, not an import time
+        with pytest.raises(ValidationError):
+            GoogleIdInfo(
+                aud=GOOGLE_CLIENT_ID,
+                iat=datetime.utcnow().timestamp(),
+                exp=datetime.utcnow().timestamp() - 1,
+                sub="1",
+                iss="accounts.google.com",
+            )
+
     def test_iss(self):
         try:
             GoogleIdInfo(
@@ -238,6 +272,55 @@ class TestGCUser:
         else:
             assert False
 
+    async def test_get_current_user_expired_token(self, backend_app, token_data):
+        token_data["exp"] = datetime.utcnow() - timedelta(seconds=1)
+        with pytest.raises(HTTPException) as ex:
+            await get_current_user(jwt.encode(token_data, SECRET_KEY, ALGORITHM))
+        assert ex.value.status_code == CREDENTIALS_EX.status_code
+
+    async def test_get_current_user_cached(
+        self, backend_app, single_admin, single_admin_access_token
+    ):
+        user_cache.clear()
+        user_object = await get_current_user(single_admin_access_token)
+        assert user_cache.info().misses == 1
+        user_object.username = "changed"
+        cached_user_object = await get_current_user(single_admin_access_token)
+        assert user_cache.info().hits == 1
+        assert cached_user_object is not user_object
+        assert cached_user_object.id == single_admin.id
+        assert cached_user_object.username == single_admin.username
+        await single_admin.delete_refresh_token()
+        assert len(user_cache) == 0
+
+    async def test_get_current_user_cache_invalidation(
+        self, backend_app, single_admin, single_admin_access_token
+    ):
+        user_cache.clear()
+        await get_current_user(single_admin_access_token)
+        await UserGinoModel.insert_or_update_by_ext_id(
+            sub=single_admin.ext_id, username="updated"
+        )
+        user_object = await get_current_user(single_admin_access_token)
+        assert user_object.username == "updated"
+
+    async def test_get_current_user_cache_disabled_login(
+        self, backend_app, single_admin, single_admin_access_token
+    ):
+        user_cache.clear()
+        await get_current_user(single_admin_access_token)
+        await UserGinoModel.update.values(disabled=True).where(
+            UserGinoModel.id == single_admin.id
+        ).gino.status()
+        with pytest.raises(HTTPException) as ex:
+            await UserGinoModel.insert_or_update_by_ext_id(
+                sub=single_admin.ext_id, username=single_admin.username
+            )
+        assert ex.value.status_code == CREDENTIALS_EX.status_code
+        assert len(user_cache) == 0
+        user_object = await UserGinoModel.get_cached(single_admin.id)
+        assert user_object.disabled
+
 
 @pytest.mark.skipif(
     os.environ.get("PLATFORM") == "GITHUB", reason="Only for a local docker."
@@ -290,6 +373,285 @@ class TestGUserFR:
             assert False
 
 
+@pytest.fixture
+def client_secrets_file(tmp_path):
+    path = tmp_path / "client_secrets.json"
+    path.write_text(
+        json.dumps(
+            {
+                "web": {
+                    "client_id": "first",
+                    "client_secret": "secret",
+                    "auth_uri": "https://accounts.google.com/o/oauth2/auth",
+                    "token_uri": "https://oauth2.googleapis.com/token",
+                }
+            }
+        )
+    )
+    return path
+
+
+class TestGoogleClientConfig:
+    """Google client secrets caching tests."""
+
+    def test_flow(self, client_secrets_file):
+        client_config = GoogleClientConfig(str(client_secrets_file), check_interval=0)
+        flow = client_config.flow()
+        assert flow.client_config["client_id"] == "first"
+        assert flow.redirect_uri.endswith(SWAP_TOKEN_ENDPOINT)
+
+    def test_reload_on_mtime_change(self, client_secrets_file):
+        client_config = GoogleClientConfig(str(client_secrets_file), check_interval=0)
+        client_config.load()
+        secrets = json.loads(client_secrets_file.read_text())
+        secrets["web"]["client_id"] = "second"
+        client_secrets_file.write_text(json.dumps(secrets))
+        stat = client_secrets_file.stat()
+        os.utime(client_secrets_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        assert client_config.config["web"]["client_id"] == "second"
+
+    def test_no_reload_within_interval(self, client_secrets_file):
+        client_config = GoogleClientConfig(str(client_secrets_file), check_interval=60)
+        client_config.load()
+        client_secrets_file.unlink()
+        assert client_config.config["web"]["client_id"] == "first"
+
+
+@pytest.fixture(scope="module")
+def google_signing_key():
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    private_pem = private_key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    )
+    public_pem = private_key.public_key().public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+    )
+    return private_pem.decode(), public_pem.decode()
+
+
+@pytest.fixture
+def google_id_token(google_signing_key):
+    signer = crypt.RSASigner.from_string(google_signing_key[0], key_id="stand-in")
+    now = int(datetime.utcnow().timestamp())
+    payload = {
+        "aud": GOOGLE_CLIENT_ID,
+        "iss": "https://accounts.google.com",
+        "sub": "7" * 21,
+        "iat": now,
+        "exp": now + 3600,
+        "email": "larry@gmail.com",
+        "given_name": "larry",
+    }
+    return google_jwt.encode(signer, payload).decode()
+
+
+@pytest.fixture
+def google_stand_in(tmp_path, httpx_mock, google_signing_key, google_id_token):
+    """Local stand-in for Google token and certs endpoints."""
+    path = tmp_path / "client_secrets.json"
+    path.write_text(
+        json.dumps(
+            {
+                "web": {
+                    "client_id": GOOGLE_CLIENT_ID,
+                    "client_secret": "secret",
+                    "auth_uri": "https://google.test/auth",
+                    "token_uri": "https://google.test/token",
+                }
+            }
+        )
+    )
+    httpx_mock.add_response(
+        method="POST",
+        url="https://google.test/token",
+        json={"id_token": google_id_token, "access_token": "google-access-token"},
+    )
+    httpx_mock.add_response(
+        method="GET",
+        url="https://google.test/certs",
+        json={"stand-in": google_signing_key[1]},
+        headers={"Cache-Control": "public, max-age=3600"},
+    )
+    return GoogleOAuth2Client(
+        client_config=GoogleClientConfig(str(path), check_interval=0),
+        certs_url="https://google.test/certs",
+        timeout=1,
+    )
+
+
+@pytest.mark.skipif(
+    os.environ.get("PLATFORM") == "GITHUB", reason="Only for a local docker."
+)
+class TestGoogleOAuth2Client:
+    """Async Google code exchange tests."""
+
+    async def test_authenticate(self, google_stand_in):
+        id_info = await google_stand_in.authenticate("code")
+        assert isinstance(id_info, GoogleIdInfo)
+        assert id_info.username == "larry"
+
+    async def test_certs_cached(self, google_stand_in, httpx_mock):
+        await google_stand_in.authenticate("code")
+        await google_stand_in.authenticate("code")
+        assert len(httpx_mock.get_requests(url="https://google.test/certs")) == 1
+        assert len(httpx_mock.get_requests(url="https://google.test/token")) == 2
+
+    async def test_bad_id_token(self, google_stand_in):
+        await google_stand_in.exchange_code("code")
+        await google_stand_in.certs()
+        with pytest.raises(HTTPException) as ex:
+            await google_stand_in.verify_id_token("bad.token.value")
+        assert ex.value.status_code == CREDENTIALS_EX.status_code
+
+    @pytest.mark.parametrize(("refetch_interval", "fetches"), [(60, 1), (0, 3)])
+    async def test_unknown_key_id_refetch(
+        self, google_stand_in, httpx_mock, google_signing_key, refetch_interval, fetches
+    ):
+        google_stand_in.refetch_interval = refetch_interval
+        await google_stand_in.exchange_code("code")
+        signer = crypt.RSASigner.from_string(google_signing_key[0], key_id="unknown")
+        id_token = google_jwt.encode(signer, {"aud": GOOGLE_CLIENT_ID}).decode()
+        for _ in range(2):
+            with pytest.raises(HTTPException) as ex:
+                await google_stand_in.verify_id_token(id_token)
+            assert ex.value.status_code == CREDENTIALS_EX.status_code
+        certs_requests = httpx_mock.get_requests(url="https://google.test/certs")
+        assert len(certs_requests) == fetches
+
+    async def test_bad_code(self, tmp_path, httpx_mock):
+        path = tmp_path / "client_secrets.json"
+        path.write_text(
+            json.dumps(
+                {
+                    "web": {
+                        "client_id": GOOGLE_CLIENT_ID,
+                        "client_secret": "secret",
+                        "token_uri": "https://google.test/token",
+                    }
+                }
+            )
+        )
+        httpx_mock.add_response(
+            method="POST",
+            url="https://google.test/token",
+            status_code=400,
+            json={"error": "invalid_grant"},
+        )
+        client = GoogleOAuth2Client(
+            client_config=GoogleClientConfig(str(path), check_interval=0),
+            certs_url="https://google.test/certs",
+            timeout=1,
+        )
+        with pytest.raises(HTTPException) as ex:
+            await client.authenticate("bad")
+        assert ex.value.status_code == OAUTH2_EX.status_code
+
+    async def test_swap_token(self, backend_app, google_stand_in, monkeypatch):
+        monkeypatch.setattr(security_handlers, "google_oauth2_client", google_stand_in)
+        resp = await backend_app.post(
+            f"{API_URL_PREFIX}/swap_token", form={"code": "code"}
+        )
+        assert resp.status_code == status.HTTP_200_OK
+        assert resp.headers["content-type"] == "application/json"
+        assert "access_token" in resp.json()
+        assert 'desc="2 queries"' in resp.headers["server-timing"]
+
+
+@pytest.fixture
+def stateless_mode(monkeypatch):
+    monkeypatch.setattr(models_auth, "AUTH_STATELESS", True)
+    monkeypatch.setattr(services_auth, "AUTH_STATELESS", True)
+
+
+@pytest.fixture
+def access_token_keys(monkeypatch):
+    keys = KeySet([SigningKey(ed25519.Ed25519PrivateKey.generate())])
+    monkeypatch.setattr(schemas_oauth2, "access_token_keys", lambda: keys)
+    return keys
+
+
+@pytest.mark.skipif(
+    os.environ.get("PLATFORM") == "GITHUB", reason="Only for a local docker."
+)
+class TestAccessTokenKeys:
+    """Access tokens signed with a key pair tests."""
+
+    async def test_get_current_user(self, backend_app, access_token_keys, single_admin):
+        token = await single_admin.create_token()
+        assert token["alg"] == "EdDSA"
+        assert jwt.get_unverified_header(token["access_token"]) == {
+            "alg": "EdDSA",
+            "kid": access_token_keys.signing_key.kid,
+            "typ": "JWT",
+        }
+        user_object = await get_current_user(token["access_token"])
+        assert user_object.id == single_admin.id
+
+    async def test_refresh_token_is_not_access_token(
+        self, backend_app, access_token_keys, single_admin
+    ):
+        token = await single_admin.create_token()
+        with pytest.raises(HTTPException) as ex:
+            await get_current_user(token["refresh_token"])
+        assert ex.value.status_code == CREDENTIALS_EX.status_code
+        user_object = await get_user_for_refresh(token["refresh_token"])
+        assert user_object.id == single_admin.id
+
+
+@pytest.mark.skipif(
+    os.environ.get("PLATFORM") == "GITHUB", reason="Only for a local docker."
+)
+class TestStatelessUser:
+    """Stateless access token tests."""
+
+    async def test_get_stateless_user(self, backend_app, stateless_mode, single_admin):
+        token = await single_admin.create_token()
+        await revoked_users.refresh()
+        user_object = await get_current_user(token["access_token"])
+        assert isinstance(user_object, UserGinoModel)
+        assert user_object.data == single_admin.data
+
+    async def test_get_stateless_logged_out_user(
+        self, backend_app, stateless_mode, single_admin
+    ):
+        token = await single_admin.create_token()
+        await revoked_users.refresh()
+        await single_admin.delete_refresh_token()
+        revoked_users.add(single_admin.id)
+        try:
+            await get_current_user(token["access_token"])
+        except HTTPException as ex:
+            assert ex.status_code == INACTIVE_EX.status_code
+        else:
+            assert False
+
+    async def test_get_stateless_disabled_user(
+        self, backend_app, stateless_mode, single_admin
+    ):
+        token = await single_admin.create_token()
+        await single_admin.update(disabled=True).apply()
+        user_cache.clear()
+        await revoked_users.refresh()
+        try:
+            await get_current_user(token["access_token"])
+        except HTTPException as ex:
+            assert ex.status_code == INACTIVE_EX.status_code
+        else:
+            assert False
+
+    async def test_get_stateless_user_bad_token(
+        self, backend_app, stateless_mode, bad_access_token
+    ):
+        try:
+            await get_current_user(bad_access_token)
+        except HTTPException as ex:
+            assert ex.status_code == CREDENTIALS_EX.status_code
+        else:
+            assert False
+
+
 @pytest.mark.skipif(
     os.environ.get("PLATFORM") == "GITHUB", reason="Only for a local docker."
 )
@@ -333,6 +695,7 @@ class TestUserInfo:
     ):
         resp = await backend_app.get(self.API_URL, headers=single_admin_auth_headers)
         assert resp.status_code == status.HTTP_200_OK
+        assert resp.headers["content-type"] == "application/vnd.api+json"
         assert "data" in resp.json()
         response_data = resp.json()["data"]
         assert "attributes" in response_data
@@ -347,6 +710,33 @@ class TestUserInfo:
         resp = await backend_app.get(self.API_URL)
         assert resp.status_code == status.HTTP_401_UNAUTHORIZED
 
+    async def test_conditional_info(
+        self, backend_app, single_admin, single_admin_auth_headers
+    ):
+        resp = await backend_app.get(self.API_URL, headers=single_admin_auth_headers)
+        assert resp.status_code == status.HTTP_200_OK
+        assert resp.headers["cache-control"] == "private, no-cache"
+        etag = resp.headers["etag"]
+        for if_none_match in (etag, f"W/{etag}", f'"other", {etag}', "*"):
+            resp = await backend_app.get(
+                self.API_URL,
+                headers={**single_admin_auth_headers, "If-None-Match": if_none_match},
+            )
+            assert resp.status_code == status.HTTP_304_NOT_MODIFIED
+            assert resp.headers["etag"] == etag
+            assert resp.content == b""
+        # changed user gets a new body
+        await UserGinoModel.insert_or_update_by_ext_id(
+            sub=single_admin.ext_id,
+            username=single_admin.username,
+            full_name="new full name",
+        )
+        resp = await backend_app.get(
+            self.API_URL, headers={**single_admin_auth_headers, "If-None-Match": etag}
+        )
+        assert resp.status_code == status.HTTP_200_OK
+        assert resp.headers["etag"] != etag
+
 
 @pytest.mark.skipif(
     os.environ.get("PLATFORM") == "GITHUB", reason="Only for a local docker."
@@ -357,6 +747,7 @@ async def test_refresh_access_token(backend_app, single_admin_refresh_token):
         query_string={"token": single_admin_refresh_token},
     )
     assert resp.status_code == status.HTTP_200_OK
+    assert resp.headers["content-type"] == "application/json"
     resp_data = resp.json()
     assert "access_token" in resp_data
     assert "refresh_token" in resp_data
@@ -370,3 +761,39 @@ async def test_refresh_access_token_with_bad_token(backend_app):
         f"{API_URL_PREFIX}/refresh_access_token", query_string={"token": "qwe"}
     )
     assert resp.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+@pytest.mark.skipif(
+    os.environ.get("PLATFORM") == "GITHUB", reason="Only for a local docker."
+)
+async def test_refresh_access_token_user_rate_limit(
+    backend_app, single_admin_refresh_token, monkeypatch
+):
+    monkeypatch.setattr(user_rate_limit, "buckets", TokenBuckets(rate=0.01, burst=1))
+    resp = await backend_app.post(
+        f"{API_URL_PREFIX}/refresh_access_token",
+        query_string={"token": single_admin_refresh_token},
+    )
+    assert resp.status_code == status.HTTP_200_OK
+    resp = await backend_app.post(
+        f"{API_URL_PREFIX}/refresh_access_token",
+        query_string={"token": resp.json()["refresh_token"]},
+    )
+    assert resp.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+    assert resp.headers["retry-after"] == "100"
+
+
+@pytest.mark.skipif(
+    os.environ.get("PLATFORM") == "GITHUB", reason="Only for a local docker."
+)
+async def test_refresh_access_token_ip_rate_limit(backend_app, monkeypatch):
+    monkeypatch.setattr(ip_rate_limit, "buckets", TokenBuckets(rate=0.5, burst=1))
+    resp = await backend_app.post(
+        f"{API_URL_PREFIX}/refresh_access_token", query_string={"token": "qwe"}
+    )
+    assert resp.status_code == status.HTTP_401_UNAUTHORIZED
+    resp = await backend_app.post(
+        f"{API_URL_PREFIX}/refresh_access_token", query_string={"token": "qwe"}
+    )
+    assert resp.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+    assert resp.headers["retry-after"] == "2"
@@ -1,12 +1,15 @@
 # -*- coding: utf-8 -*-
 """User core tests."""
+import asyncio
 import os
 from datetime import datetime
+from uuid import uuid4
 
 import pytest
 from asyncpg.pgproto.pgproto import UUID as UUID_PG
 
-from core.database import TokenInfoGinoModel, UserGinoModel
+from core.database import TokenInfoGinoModel, UserGinoModel, db
+from core.database.models.security import auth as models_auth
 from core.schemas import (
     UserDataCreateModel,
     UserDataUpdateModel,
@@ -98,6 +101,13 @@ class TestUserDB:
         assert attributes["username"] == single_admin.username
         assert "type" not in attributes
 
+    @pytest.mark.api_base
+    async def test_user_attributes_getter(self):
+        names, getter = UserGinoModel.json_api_attributes_getter()
+        assert "id" not in names
+        assert set(names) == set(UserGinoModel.__table__.columns.keys()) - {"id"}
+        assert UserGinoModel.json_api_attributes_getter()[1] is getter
+
 
 class TestUserPydantic:
     """User pydantic serializer tests."""
@@ -196,6 +206,18 @@ class TestUserToken:
         token_obj = await TokenInfoGinoModel.get(single_admin.id)
         assert not token_obj
 
+    async def test_add_token_concurrently(self, backend_app, single_admin):
+        await asyncio.gather(
+            *(
+                TokenInfoGinoModel.add_token(single_admin.id, f"token-{i}")
+                for i in range(5)
+            )
+        )
+        tokens = await TokenInfoGinoModel.query.where(
+            TokenInfoGinoModel.user_id == single_admin.id
+        ).gino.all()
+        assert len(tokens) == 1
+
     async def test_create_token(self, backend_app, single_admin):
         token = await single_admin.create_token()
         assert isinstance(token, dict)
@@ -220,3 +242,165 @@ class TestUserToken:
             sub="1", username="new-user"
         )
         assert isinstance(created_user, UserGinoModel)
+
+    async def test_update_by_ext_id_unchanged(self, backend_app, single_admin):
+        row_version = (
+            db.select([db.literal_column("xmin::text")])
+            .where(UserGinoModel.id == single_admin.id)
+            .gino.scalar
+        )
+        version = await row_version()
+        same_user = await UserGinoModel.insert_or_update_by_ext_id(
+            sub=single_admin.ext_id,
+            username=single_admin.username,
+            family_name=single_admin.family_name,
+            given_name=single_admin.given_name,
+            full_name=single_admin.full_name,
+        )
+        assert same_user.id == single_admin.id
+        assert await row_version() == version
+        updated_user = await UserGinoModel.insert_or_update_by_ext_id(
+            sub=single_admin.ext_id, username="updated"
+        )
+        assert updated_user.id == single_admin.id
+        assert updated_user.username == "updated"
+        assert updated_user.full_name is None
+        assert await row_version() != version
+
+    async def test_create_by_ext_id_concurrently(self, backend_app):
+        users = await asyncio.gather(
+            *(
+                UserGinoModel.insert_or_update_by_ext_id(sub="1", username="new-user")
+                for _ in range(5)
+            )
+        )
+        assert len({user.id for user in users}) == 1
+
+    async def test_token_is_valid_hmac(self, backend_app, single_admin, monkeypatch):
+        monkeypatch.setattr(models_auth, "REFRESH_TOKEN_HASH_SCHEME", "hmac-sha256")
+        token = await single_admin.create_token()
+        token_info = await single_admin.token_info()
+        assert token_info.refresh_token.startswith(models_auth.HMAC_SHA256_PREFIX)
+        assert await single_admin.token_is_valid(token["refresh_token"])
+        assert not await single_admin.token_is_valid("bad")
+
+    async def test_token_is_valid_bcrypt_migration(
+        self, backend_app, single_admin, monkeypatch
+    ):
+        token = await single_admin.create_token()
+        monkeypatch.setattr(models_auth, "REFRESH_TOKEN_HASH_SCHEME", "hmac-sha256")
+        assert await single_admin.token_is_valid(token["refresh_token"])
+        token = await single_admin.create_token()
+        token_info = await single_admin.token_info()
+        assert token_info.refresh_token.startswith(models_auth.HMAC_SHA256_PREFIX)
+        assert await single_admin.token_is_valid(token["refresh_token"])
+
+
+@pytest.mark.skipif(
+    os.environ.get("PLATFORM") == "GITHUB", reason="Only for a local docker."
+)
+class TestUsersBatch:
+    """Users batch lookup tests."""
+
+    API_URL = "/api/v1/users"
+
+    async def test_order_and_missing(
+        self, backend_app, single_admin, single_user, single_admin_auth_headers
+    ):
+        missing_id = str(uuid4())
+        ids = [single_user.id_str, missing_id, single_admin.id_str, single_user.id_str]
+        resp = await backend_app.get(
+            self.API_URL,
+            query_string={"filter[id]": ",".join(ids)},
+            headers=single_admin_auth_headers,
+        )
+        assert resp.status_code == 200
+        resp_data = resp.json()
+        assert [user["id"] for user in resp_data["data"]] == [
+            single_user.id_str,
+            single_admin.id_str,
+        ]
+        assert resp_data["data"][0]["attributes"]["username"] == single_user.username
+        assert resp_data["meta"] == {"missing": [missing_id]}
+
+    async def test_get_batch(self, backend_app, single_admin, single_user):
+        users = await UserGinoModel.get_batch(
+            [single_admin.id, uuid4(), single_user.id]
+        )
+        assert set(users) == {single_admin.id, single_user.id}
+        assert users[single_user.id].username == single_user.username
+
+    @pytest.mark.parametrize(
+        ("ids", "detail"),
+        [
+            ("", "Invalid filter value."),
+            ("1,2", "Invalid filter value."),
+            (",".join(str(uuid4()) for _ in range(101)), "Too many filter values."),
+        ],
+    )
+    async def test_bad_filter(
+        self, backend_app, single_admin_auth_headers, ids, detail
+    ):
+        resp = await backend_app.get(
+            self.API_URL,
+            query_string={"filter[id]": ids},
+            headers=single_admin_auth_headers,
+        )
+        assert resp.status_code == 400
+        assert resp.json()["detail"] == detail
+
+    async def test_unauthorized(self, backend_app):
+        resp = await backend_app.get(
+            self.API_URL, query_string={"filter[id]": str(uuid4())}
+        )
+        assert resp.status_code == 401
+
+
+@pytest.mark.skipif(
+    os.environ.get("PLATFORM") == "GITHUB", reason="Only for a local docker."
+)
+class TestImportUsers:
+    """Users bulk import tests."""
+
+    async def test_import_profiles(
+        self, backend_app, single_admin, single_disabled_user
+    ):
+        result = await UserGinoModel.import_profiles(
+            iter(
+                [
+                    {"ext_id": single_admin.ext_id, "username": "updated"},
+                    {"ext_id": "new", "username": "first", "full_name": "First"},
+                    {"ext_id": "new", "username": "last"},
+                    {"ext_id": single_disabled_user.ext_id, "username": "updated"},
+                ]
+            )
+        )
+        assert result == (4, 1, 1)
+        updated_user = await UserGinoModel.get(single_admin.id)
+        assert updated_user.username == "updated"
+        assert updated_user.given_name is None
+        new_user = await UserGinoModel._get_by_ext_id.first(sub="new")
+        assert (new_user.username, new_user.full_name) == ("last", None)
+        assert not new_user.disabled and not new_user.superuser
+        disabled_user = await UserGinoModel.get(single_disabled_user.id)
+        assert disabled_user.username == single_disabled_user.username
+
+    async def test_import_profiles_unchanged(self, backend_app, single_user):
+        profile = {
+            key: getattr(single_user, key)
+            for key in ("ext_id", "username", "given_name", "family_name", "full_name")
+        }
+        assert await UserGinoModel.import_profiles([profile]) == (1, 0, 0)
+        assert await UserGinoModel.import_profiles([]) == (0, 0, 0)
+
+    async def test_import_profiles_rollback(self, backend_app, single_user):
+        def profiles():
+            yield {"ext_id": "new", "username": "new"}
+            yield {"ext_id": single_user.ext_id, "username": "updated"}
+            raise ValueError("line 3: username is required")
+
+        with pytest.raises(ValueError):
+            await UserGinoModel.import_profiles(profiles())
+        assert await UserGinoModel._get_by_ext_id.first(sub="new") is None
+        user = await UserGinoModel.get(single_user.id)
+        assert user.username == single_user.username
@@ -0,0 +1,603 @@
+# -*- coding: utf-8 -*-
+"""Core utils tests."""
+
+import asyncio
+import os
+from contextvars import copy_context
+from datetime import datetime, timezone
+from uuid import uuid4
+
+import pytest
+from async_asgi_testclient import TestClient
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519, rsa
+from fastapi import Depends, FastAPI, HTTPException
+from fastapi_pagination import add_pagination
+from jose import jwt
+from jose.utils import base64url_encode
+from sqlalchemy.engine.url import make_url
+from starlette.config import Config
+
+from core.config import (
+    DB_DSN,
+    check_refresh_token_hash,
+    non_negative_float,
+    positive_int,
+)
+from core.database import TokenInfoGinoModel, UserGinoModel, db
+from core.schemas import UserDBModel
+from core.utils import (
+    AdaptivePoolSize,
+    CPUBoundExecutor,
+    CursorParams,
+    HMACTokenVerifier,
+    InvalidTokenError,
+    JsonApiCursorPage,
+    JsonApiResponse,
+    RateLimit,
+    ReadReplicas,
+    TokenBuckets,
+    TokenVerifier,
+    TTLCache,
+    UUIDBloomFilter,
+    jwks_endpoint,
+    paginate_by_cursor,
+    pool_sizing,
+)
+from core.utils.fastapi_pagination import decode_cursor, encode_cursor
+from core.utils.jwk import KeySet, SigningKey
+from core.utils.query_timing import slow_query_logger, timed_cursor_cls
+
+pytestmark = [pytest.mark.api_base]
+
+
+class TestTTLCache:
+    """Per-worker TTL/LRU cache tests."""
+
+    def test_hit_and_miss(self):
+        cache = TTLCache(maxsize=2, ttl=60)
+        assert cache.get("a") is None
+        cache.set("a", 1)
+        assert cache.get("a") == 1
+        info = cache.info()
+        assert info.hits == 1
+        assert info.misses == 1
+        assert info.currsize == 1
+
+    def test_lru_eviction(self):
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+        assert cache.get("c") == 3
+
+    def test_ttl(self):
+        cache = TTLCache(maxsize=2, ttl=-1)
+        cache.set("a", 1)
+        assert cache.get("a") is None
+        assert len(cache) == 0
+
+    def test_pop(self):
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.set("a", 1)
+        assert cache.pop("a") == 1
+        assert cache.pop("a") is None
+        assert cache.get("a") is None
+
+    def test_disabled(self):
+        cache = TTLCache(maxsize=0, ttl=60)
+        cache.set("a", 1)
+        assert cache.get("a") is None
+
+
+class TestTokenBuckets:
+    """Token bucket rate limits tests."""
+
+    def test_burst_and_refill(self):
+        buckets = TokenBuckets(rate=2, burst=3)
+        assert [buckets.take("key", now=0) for _ in range(3)] == [0, 0, 0]
+        assert buckets.take("key", now=0) == 0.5
+        assert buckets.take("other", now=0) == 0
+        assert buckets.take("key", now=0.5) == 0
+        assert buckets.take("key", now=0.5) == 0.5
+
+    def test_idle_eviction(self):
+        buckets = TokenBuckets(rate=1, burst=2, shards=4)
+        for key in range(100):
+            buckets.take(key, now=0)
+        assert len(buckets) == 100
+        # every call after a refill time sweeps the next shard
+        for shard in range(4):
+            buckets.take("active", now=10 + shard)
+        assert len(buckets) == 1
+
+    @pytest.mark.parametrize(("rate", "burst"), [(0, 1), (-1, 1), (1, 0)])
+    def test_invalid(self, rate, burst):
+        with pytest.raises(ValueError):
+            TokenBuckets(rate=rate, burst=burst)
+
+    def test_zero_rate_disables_limit(self):
+        rate_limit = RateLimit(rate=0, burst=1)
+        assert not rate_limit.enabled
+        assert rate_limit.buckets is None
+        for _ in range(3):
+            rate_limit.check("key")
+        rate_limit.clear()
+
+    @pytest.mark.parametrize(
+        ("value", "cast"),
+        [("-1", non_negative_float), ("0", positive_int), ("x", positive_int)],
+    )
+    def test_invalid_settings(self, value, cast):
+        config = Config(environ={"RATE_LIMIT_IP_RATE": value})
+        with pytest.raises(ValueError, match="Config 'RATE_LIMIT_IP_RATE'"):
+            config("RATE_LIMIT_IP_RATE", cast=cast)
+
+
+class TestHMACTokenVerifier:
+    """Single pass JWT verification tests."""
+
+    claims = {"id": "1", "exp": 100}
+
+    def test_decode(self):
+        verifier = HMACTokenVerifier("key", "HS256")
+        token = jwt.encode(self.claims, "key", algorithm="HS256")
+        assert verifier.decode(token, now=99) == self.claims
+        # cached header
+        assert verifier.decode(token, now=99) == self.claims
+
+    @pytest.mark.parametrize(
+        ("token", "now"),
+        [
+            (jwt.encode(claims, "key", algorithm="HS256"), 100),
+            (jwt.encode({"id": "1"}, "key", algorithm="HS256"), 0),
+            (jwt.encode(claims, "other", algorithm="HS256"), 0),
+            (jwt.encode(claims, "key", algorithm="HS512"), 0),
+            (jwt.encode(claims, "key", algorithm="HS256") + "x", 0),
+            ("not.a.token", 0),
+            ("", 0),
+            (None, 0),
+        ],
+    )
+    def test_invalid(self, token, now):
+        verifier = HMACTokenVerifier("key", "HS256")
+        with pytest.raises(InvalidTokenError):
+            verifier.decode(token, now=now)
+
+    def test_header_algorithm(self):
+        """Signature over a header with another algorithm is not accepted."""
+        verifier = HMACTokenVerifier("key", "HS256")
+        token = jwt.encode(self.claims, "key", algorithm="HS256")
+        header, payload, _ = token.split(".")
+        forged = jwt.encode(self.claims, "key", algorithm="HS384").split(".")[0]
+        signing_input = f"{forged}.{payload}".encode()
+        signature = base64url_encode(verifier.signature(signing_input))
+        with pytest.raises(InvalidTokenError):
+            verifier.decode(f"{forged}.{payload}.{signature.decode()}", now=0)
+
+    def test_incomplete_verifier(self):
+        class HeaderOnlyVerifier(TokenVerifier):
+            def header_key(self, header: dict):
+                return None
+
+        with pytest.raises(TypeError):
+            HeaderOnlyVerifier()
+
+
+def rsa_key():
+    return SigningKey(rsa.generate_private_key(public_exponent=65537, key_size=2048))
+
+
+def ec_key():
+    return SigningKey(ec.generate_private_key(ec.SECP256R1()))
+
+
+def ed25519_key():
+    return SigningKey(ed25519.Ed25519PrivateKey.generate())
+
+
+class TestKeySet:
+    """Asymmetric access tokens keys tests."""
+
+    claims = {"id": "1", "exp": 100}
+
+    @pytest.mark.parametrize(
+        ("new_key", "algorithm"),
+        [(rsa_key, "RS256"), (ec_key, "ES256"), (ed25519_key, "EdDSA")],
+    )
+    def test_encode_decode(self, new_key, algorithm):
+        keys = KeySet([new_key()])
+        token = keys.encode(self.claims)
+        assert keys.algorithm == algorithm
+        assert keys.decode(token, now=99) == self.claims
+        # cached header
+        assert keys.decode(token, now=99) == self.claims
+        with pytest.raises(InvalidTokenError):
+            keys.decode(token, now=100)
+        with pytest.raises(InvalidTokenError):
+            keys.decode(token[:-4] + "AAAA", now=0)
+
+    @pytest.mark.parametrize("new_key", [rsa_key, ec_key])
+    def test_jwks(self, new_key):
+        """Other services verify tokens with a published key."""
+        keys = KeySet([new_key()])
+        (jwk,) = keys.jwks()["keys"]
+        assert jwk["kid"] == keys.signing_key.kid
+        token = keys.encode(self.claims)
+        assert jwt.get_unverified_header(token)["kid"] == jwk["kid"]
+        claims = jwt.decode(
+            token, jwk, algorithms=[jwk["alg"]], options={"verify_exp": False}
+        )
+        assert claims == self.claims
+
+    def test_rotation(self):
+        previous, new = ed25519_key(), ed25519_key()
+        token = KeySet([previous]).encode(self.claims)
+        public_only = SigningKey(previous.public_key)
+        assert public_only.kid == previous.kid
+        assert KeySet([new, public_only]).decode(token, now=0) == self.claims
+        with pytest.raises(InvalidTokenError):
+            KeySet([new]).decode(token, now=0)
+        with pytest.raises(ValueError, match="private key"):
+            KeySet([public_only])
+
+    def test_hmac_token(self):
+        keys = KeySet([ed25519_key()])
+        with pytest.raises(InvalidTokenError):
+            keys.decode(jwt.encode(self.claims, "key", algorithm="HS256"), now=0)
+
+
+@pytest.mark.asyncio
+async def test_jwks_endpoint():
+    jwks = KeySet([ed25519_key()]).jwks()
+    application = FastAPI()
+    application.add_route("/jwks.json", jwks_endpoint(jwks, max_age=60))
+    async with TestClient(application) as client:
+        response = await client.get("/jwks.json")
+        assert response.status_code == 200
+        assert response.json() == jwks
+        assert response.headers["cache-control"] == "public, max-age=60"
+        response = await client.get(
+            "/jwks.json", headers={"If-None-Match": response.headers["etag"]}
+        )
+        assert response.status_code == 304
+
+
+class TestUUIDBloomFilter:
+    """Bloom filter tests."""
+
+    def test_no_false_negatives(self):
+        values = [uuid4() for _ in range(1000)]
+        bloom = UUIDBloomFilter(capacity=len(values), error_rate=0.01)
+        for value in values:
+            bloom.add(value)
+        assert all(value in bloom for value in values)
+
+    def test_error_rate(self):
+        bloom = UUIDBloomFilter(capacity=1000, error_rate=0.01)
+        for _ in range(1000):
+            bloom.add(uuid4())
+        false_positives = sum(uuid4() in bloom for _ in range(10000))
+        assert false_positives < 300
+
+    def test_empty(self):
+        bloom = UUIDBloomFilter(capacity=0)
+        assert uuid4() not in bloom
+
+
+class TestCPUBoundExecutor:
+    """CPU-bound executor tests."""
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("kind", ["thread", "process", "none"])
+    async def test_run(self, kind):
+        executor = CPUBoundExecutor(kind=kind, max_workers=1)
+        assert await executor.run(pow, 2, 10) == 1024
+        executor.shutdown()
+
+    def test_unknown_kind(self):
+        with pytest.raises(ValueError):
+            CPUBoundExecutor(kind="fiber")
+
+
+@pytest.mark.parametrize(
+    ("scheme", "key"), [("hmac_sha256", "key"), ("hmac-sha256", None), ("", "key")]
+)
+def test_check_refresh_token_hash_invalid(scheme, key):
+    with pytest.raises(ValueError):
+        check_refresh_token_hash(scheme, key)
+
+
+def test_check_refresh_token_hash():
+    check_refresh_token_hash("bcrypt", None)
+    check_refresh_token_hash("hmac-sha256", "key")
+
+
+class TestCursorPagination:
+    """Keyset pagination tests."""
+
+    keys = (UserGinoModel.created, UserGinoModel.id)
+
+    @pytest.fixture
+    def users_app(self):
+        app = FastAPI()
+
+        @app.get("/users", response_model=JsonApiCursorPage[UserDBModel])
+        async def users(params: CursorParams = Depends()):
+            return await paginate_by_cursor(UserGinoModel, self.keys, params)
+
+        return add_pagination(app)
+
+    def test_cursor(self):
+        values = (datetime.now(timezone.utc), uuid4())
+        assert decode_cursor(encode_cursor(values), self.keys) == values
+
+    @pytest.mark.parametrize("cursor", ["bad", encode_cursor([1])])
+    def test_bad_cursor(self, cursor):
+        with pytest.raises(HTTPException) as ex:
+            decode_cursor(cursor, self.keys)
+        assert ex.value.status_code == 400
+
+    @pytest.mark.asyncio
+    @pytest.mark.skipif(
+        os.environ.get("PLATFORM") == "GITHUB", reason="Only for a local docker."
+    )
+    async def test_paginate_by_cursor(self, backend_app, users_app):
+        users = [
+            await UserGinoModel.create(ext_id=str(i), username=f"user-{i}")
+            for i in range(5)
+        ]
+        expected = [
+            str(user.id) for user in sorted(users, key=lambda u: (u.created, u.id))
+        ]
+        received = []
+        async with TestClient(users_app) as client:
+            url = "/users?size=2&total=true"
+            while url:
+                resp = await client.get(url)
+                assert resp.status_code == 200
+                page = resp.json()
+                assert page["total"] == 5
+                assert len(page["data"]) <= 2
+                received += [user["id"] for user in page["data"]]
+                url = page["links"]["next"]
+            resp = await client.get("/users")
+            assert resp.json()["total"] is None
+            assert resp.json()["links"]["next"] is None
+        assert received == expected
+
+
+class TestReadReplicas:
+    """Read replicas routing tests, primary database acts as a replica."""
+
+    @pytest.fixture
+    async def replicas(self, backend_app):
+        replicas = ReadReplicas(
+            dsns=[DB_DSN, DB_DSN],
+            balance="round_robin",
+            sticky_seconds=60,
+            retry_interval=60,
+            min_size=1,
+            max_size=2,
+        )
+        await replicas.start()
+        yield replicas
+        await replicas.stop()
+
+    def test_unknown_balance(self):
+        with pytest.raises(ValueError):
+            ReadReplicas(dsns=[], balance="random", sticky_seconds=1, retry_interval=1)
+
+    @pytest.mark.asyncio
+    @pytest.mark.skipif(
+        os.environ.get("PLATFORM") == "GITHUB", reason="Only for a local docker."
+    )
+    async def test_balance(self, replicas):
+        first, second = replicas.engines
+        assert {replicas.engine(), replicas.engine()} == {first, second}
+        replicas.balance = "least_loaded"
+        async with first.acquire():
+            assert replicas.engine() is second
+            assert replicas.engine() is second
+
+    @pytest.mark.asyncio
+    @pytest.mark.skipif(
+        os.environ.get("PLATFORM") == "GITHUB", reason="Only for a local docker."
+    )
+    async def test_sticky(self, replicas):
+        written, other = uuid4(), uuid4()
+        # request that wrote reads everything from the primary
+        request = copy_context()
+        request.run(replicas.mark_written, written)
+        assert request.run(replicas.engine, other) is None
+        # next requests read only the written key from the primary
+        assert copy_context().run(replicas.engine, written) is None
+        assert copy_context().run(replicas.engine, other) in replicas.engines
+
+    @pytest.mark.asyncio
+    @pytest.mark.skipif(
+        os.environ.get("PLATFORM") == "GITHUB", reason="Only for a local docker."
+    )
+    async def test_get(self, replicas):
+        user = await UserGinoModel.create(ext_id="1", username="user")
+        assert (await replicas.get(UserGinoModel, user.id)).id == user.id
+        # replica failure falls back to the primary and skips the replica
+        await replicas.engines[0].close()
+        replicas.balance = "round_robin"
+        for _ in replicas.engines:
+            assert (await replicas.get(UserGinoModel, user.id)).id == user.id
+        assert replicas.available() == replicas.engines[1:]
+        assert await replicas.get(UserGinoModel, uuid4()) is None
+        replicas.engines.pop(0)
+
+    @pytest.mark.asyncio
+    @pytest.mark.skipif(
+        os.environ.get("PLATFORM") == "GITHUB", reason="Only for a local docker."
+    )
+    async def test_get_many(self, replicas):
+        user = await UserGinoModel.create(ext_id="1", username="user")
+        missing = uuid4()
+        users = await replicas.get_many(UserGinoModel, [missing, user.id])
+        assert list(users) == [user.id]
+        # failed replica falls back to the primary
+        for engine in replicas.engines:
+            await engine.close()
+        users = await replicas.get_many(UserGinoModel, [missing, user.id])
+        assert list(users) == [user.id]
+        assert len(replicas.available()) == 1
+        replicas.engines.clear()
+
+    @pytest.mark.asyncio
+    @pytest.mark.skipif(
+        os.environ.get("PLATFORM") == "GITHUB", reason="Only for a local docker."
+    )
+    async def test_unavailable_on_startup(self, backend_app):
+        dsn = make_url(str(DB_DSN))
+        dsn.port = 1
+        replicas = ReadReplicas(
+            dsns=[dsn], balance="round_robin", sticky_seconds=1, retry_interval=1
+        )
+        await replicas.start()
+        assert replicas.engines == []
+        assert replicas.engine() is None
+
+
+@pytest.mark.asyncio
+@pytest.mark.skipif(
+    os.environ.get("PLATFORM") == "GITHUB", reason="Only for a local docker."
+)
+async def test_adaptive_pool_size(backend_app):
+    pool = db.bind.raw_pool
+    # warmed up on startup
+    assert pool.get_size() >= 4
+    pool_size = AdaptivePoolSize(
+        db, min_size=1, max_size=8, interval=60, grow_wait=0.005
+    )
+    assert pool_size.supported
+    acquire = db.bind._pool.acquire
+    # pool is wrapped once and shared with metrics, callbacks are added once
+    pool_size.instrument()
+    pool_size.instrument()
+    assert db.bind._pool.acquire is acquire
+    await UserGinoModel.query.gino.all()
+    assert pool_size.acquires == 1
+    assert pool_size.peak == 1
+
+    pool_size.wait = 0.01
+    pool_size.resize()
+    assert pool.get_min_size() == 2
+    # grows up to the peak usage, but no more than max_size
+    pool_size.acquires, pool_size.wait, pool_size.peak = 1, 0.01, 7
+    pool_size.resize()
+    assert pool.get_min_size() == 7
+    pool_size.acquires, pool_size.wait = 1, 0.01
+    pool_size.resize()
+    assert pool.get_min_size() == 8
+    # missing connections are opened in the background
+    for _ in range(50):
+        if pool.get_size() == 8:
+            break
+        await asyncio.sleep(0.1)
+    assert pool.get_size() == 8
+
+    # shrinks if at most half of the floor is in use
+    pool_size.peak = 5
+    pool_size.resize()
+    assert pool.get_min_size() == 8
+    pool_size.peak = 1
+    pool_size.resize()
+    assert pool.get_min_size() == 4
+    assert pool.get_size() == 4
+
+
+@pytest.mark.asyncio
+@pytest.mark.skipif(
+    os.environ.get("PLATFORM") == "GITHUB", reason="Only for a local docker."
+)
+async def test_adaptive_pool_size_unsupported(backend_app, monkeypatch, caplog):
+    # alembic logging fileConfig disables existing loggers
+    monkeypatch.setattr(pool_sizing.logger, "disabled", False)
+    # internals of another asyncpg version
+    monkeypatch.setattr(pool_sizing, "POOL_INTERNALS", ("_minsize", "_max_floor"))
+    pool_size = AdaptivePoolSize(
+        db, min_size=1, max_size=8, interval=60, grow_wait=0.005
+    )
+    assert not pool_size.supported
+    await pool_size.start()
+    assert "Adaptive database pool size is off" in caplog.text
+    await UserGinoModel.query.gino.all()
+    assert pool_size.acquires == 0
+    await pool_size.stop()
+
+
+@pytest.mark.asyncio
+@pytest.mark.skipif(
+    os.environ.get("PLATFORM") == "GITHUB", reason="Only for a local docker."
+)
+async def test_compiled_get(backend_app):
+    user = await UserGinoModel.create(ext_id="1", username="user")
+    assert (await UserGinoModel.get(user.id)).id == user.id
+    assert await UserGinoModel.get(uuid4()) is None
+    assert await TokenInfoGinoModel.get(user.id) is None
+    # every model has its own query compiled once
+    compiled = UserGinoModel._compiled_get.compiled()
+    await UserGinoModel.get(user.id)
+    assert UserGinoModel._compiled_get.compiled() is compiled
+    assert TokenInfoGinoModel._compiled_get.compiled() is not compiled
+
+
+def test_json_api_response():
+    user_id = uuid4()
+    created = datetime(2021, 5, 10, tzinfo=timezone.utc)
+    response = JsonApiResponse({"id": user_id, "created": created})
+    assert response.media_type == "application/vnd.api+json"
+    assert response.body == (
+        f'{{"id":"{user_id}","created":"2021-05-10T00:00:00+00:00"}}'.encode()
+    )
+
+
+@pytest.mark.asyncio
+@pytest.mark.skipif(
+    os.environ.get("PLATFORM") == "GITHUB", reason="Only for a local docker."
+)
+async def test_metrics(backend_app):
+    resp = await backend_app.get("/api/v1/user/info")
+    assert resp.status_code == 401
+    resp = await backend_app.get("/api/v1/no-such-route")
+    assert resp.status_code == 404
+    resp = await backend_app.get("/metrics")
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/plain")
+    metrics = resp.text
+    assert (
+        'http_request_duration_seconds_count{method="GET",'
+        'route="/api/v1/user/info",status="401"}'
+    ) in metrics
+    assert 'route="<unmatched>",status="404"' in metrics
+    assert "db_pool_size " in metrics
+    assert "db_pool_idle_connections " in metrics
+    assert "db_pool_acquire_seconds_count " in metrics
+
+
+@pytest.mark.asyncio
+@pytest.mark.skipif(
+    os.environ.get("PLATFORM") == "GITHUB", reason="Only for a local docker."
+)
+async def test_slow_query_log(backend_app, caplog, monkeypatch):
+    # alembic logging fileConfig disables existing loggers
+    monkeypatch.setattr(slow_query_logger, "disabled", False)
+    dialect = db.bind._dialect
+    cursor_cls = dialect.cursor_cls
+    dialect.cursor_cls = timed_cursor_cls(type(dialect).cursor_cls, 1e-9)
+    try:
+        await UserGinoModel.query.where(UserGinoModel.ext_id == "secret").gino.all()
+    finally:
+        dialect.cursor_cls = cursor_cls
+    messages = [
+        r.getMessage() for r in caplog.records if r.name == slow_query_logger.name
+    ]
+    assert len(messages) == 1
+    assert "1 redacted params" in messages[0]
+    assert "secret" not in messages[0]
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""Users bulk import command tests."""
+
+import pytest
+
+from import_users import parse_args, read_csv, read_ndjson
+
+
+def test_read_csv():
+    lines = ["ext_id,username,full_name,extra\n", "1,one,One,x\n", "2,two,,\n"]
+    assert list(read_csv(lines)) == [
+        {
+            "ext_id": "1",
+            "username": "one",
+            "given_name": None,
+            "family_name": None,
+            "full_name": "One",
+        },
+        {
+            "ext_id": "2",
+            "username": "two",
+            "given_name": None,
+            "family_name": None,
+            "full_name": None,
+        },
+    ]
+
+
+def test_read_ndjson():
+    lines = [b'{"ext_id": "1", "username": "one", "given_name": "One"}\n', b"\n"]
+    assert list(read_ndjson(lines)) == [
+        {
+            "ext_id": "1",
+            "username": "one",
+            "given_name": "One",
+            "family_name": None,
+            "full_name": None,
+        }
+    ]
+
+
+@pytest.mark.parametrize(
+    ("reader", "lines", "error"),
+    [
+        (read_csv, ["ext_id,username\n", "1,one\n", "2,\n"], "line 3: username"),
+        (read_ndjson, ['{"username": "one"}\n'], "line 1: ext_id"),
+        (read_ndjson, ["\n", '{"ext_id": 1, "username": "one"}\n'], "line 2: ext_id"),
+        (read_ndjson, ['["1", "one"]\n'], "line 1: not an object"),
+        (read_ndjson, ["{\n"], "line 1: "),
+    ],
+)
+def test_read_invalid(reader, lines, error):
+    with pytest.raises(ValueError, match=error):
+        list(reader(lines))
+
+
+def test_parse_args():
+    assert parse_args(["users.CSV"]).format == "csv"
+    assert parse_args(["users.jsonl"]).format == "ndjson"
+    assert parse_args(["-", "--format", "ndjson"]).format == "ndjson"
+    with pytest.raises(SystemExit):
+        parse_args(["users.txt"])
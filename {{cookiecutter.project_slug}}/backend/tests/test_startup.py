@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+"""Worker startup tests."""
+
+import os
+
+import pytest
+
+from benchmarks.startup import BUDGETS, LAZY_MODULES, run, violations
+
+
+def test_startup_lazy_imports():
+    """Login-only dependencies are not imported on startup."""
+    results = run(repeat=1)
+    assert results["lazy"] == {stage: [] for stage in LAZY_MODULES}
+    assert set(results["timings"]) == set(BUDGETS)
+
+
+@pytest.mark.benchmark
+@pytest.mark.skipif(
+    not os.environ.get("RUN_BENCHMARKS"),
+    reason="Wall-clock budgets depend on the machine, set RUN_BENCHMARKS=1.",
+)
+def test_startup_budget():
+    """Fresh interpreter imports and app construction stay in budgets."""
+    assert violations(run(repeat=3)) == []
+
+
+def test_startup_violations():
+    results = {
+        "timings": {"import core.database": 0.1, "import api": 1.0},
+        "lazy": {"import api": ["passlib"]},
+    }
+    assert violations(results) == [
+        "import api: 1000ms, budget 250ms",
+        "import api imports passlib",
+    ]
+    assert violations(results, scale=4) == ["import api imports passlib"]